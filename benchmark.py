@@ -0,0 +1,266 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from main import (LEAGUE_SCORING, ROSTER_CAPS, PlayerStore, RosterOptimizer, fantasy_value, merge_player_stats,
+                  merge_seasons, pool_caps, projection_spread, quarterback_stack, read_player_stats, load_season,
+                  scoring_weights, solve_cardinality_roster, split_positions, team_limit, teammate_penalty,
+                  usage_limit)
+
+# Players in one league-wide season (1x scale)
+LEAGUE_PLAYERS = 600
+
+# Over-header and header rows of the Pro-Football-Reference fantasy csv
+CSV_GROUPS = ["", "", "", "", "", "Games", "Games", "Passing", "Passing", "Passing", "Passing", "Passing",
+              "Rushing", "Rushing", "Rushing", "Rushing", "Receiving", "Receiving", "Receiving", "Receiving",
+              "Receiving", "Fumbles", "Fumbles", "Scoring", "Scoring", "Scoring", "Fantasy", "Fantasy",
+              "Fantasy", "Fantasy", "Fantasy", "Fantasy", "Fantasy"]
+CSV_HEADER = ["Rk", "Player", "Tm", "FantPos", "Age", "G", "GS", "Cmp", "Att", "Yds", "TD", "Int", "Att", "Yds",
+              "Y/A", "TD", "Tgt", "Rec", "Yds", "Y/R", "TD", "Fmb", "FL", "TD", "2PM", "2PP", "FantPt", "PPR",
+              "DKPt", "FDPt", "VBD", "PosRank", "OvRank"]
+TEAMS = ["ARI", "ATL", "BAL", "BUF", "CAR", "CHI", "CIN", "CLE", "DAL", "DEN", "DET", "GNB", "HOU", "IND", "JAX",
+         "KAN", "LAC", "LAR", "LVR", "MIA", "MIN", "NOR", "NWE", "NYG", "NYJ", "PHI", "PIT", "SEA", "SFO", "TAM",
+         "TEN", "WAS"]
+
+def write_synthetic_seasons(stat_dir:str, players:int, seasons:int, first_season_year:int=2000, seed:int=0):
+    """
+    Write synthetic season csvs in the Pro-Football-Reference layout read_player_stats expects.
+
+    Parameters
+    ----------
+    stat_dir: str
+        Directory to write <year>.csv files to
+    players: int
+        Players in each season
+    seasons: int
+        Number of seasons
+    first_season_year: int
+        Year of the first season
+    seed: int
+        Seed of the synthetic statistics
+
+    Returns
+    -------
+    seasons_csv: list
+        Addresses of the season csvs, oldest first
+    """
+    rng = np.random.default_rng(seed)
+
+    # Player pool with roughly a fifth of the players turning over each season
+    pool = players * (1 + seasons // 5)
+    name = np.array(["Player " + str(_i) for _i in range(pool)], dtype=object)
+    position = rng.choice(["QB", "RB", "WR", "TE"], pool, p=[0.15, 0.3, 0.4, 0.15])
+    team = rng.choice(TEAMS, pool)
+    talent = rng.gamma(2., 1., pool)
+    debut_age = rng.integers(21, 26, pool)
+
+    seasons_csv = []
+    for _s in range(seasons):
+        rows = np.sort(rng.choice(pool, players, replace=False) if _s else np.arange(players))
+        n = len(rows)
+        level = talent[rows] * rng.uniform(0.6, 1.4, n)
+        qb = position[rows] == "QB"
+        rb = position[rows] == "RB"
+        receiver = (position[rows] == "WR") | (position[rows] == "TE")
+        columns = np.zeros((n, len(CSV_HEADER)))
+        columns[:, 0] = np.arange(1, n+1)
+        columns[:, 5] = columns[:, 6] = 17
+        columns[:, 9] = qb * 2000 * level
+        columns[:, 10] = qb * 12 * level
+        columns[:, 11] = qb * 8 * rng.random(n) * level
+        columns[:, 12] = (qb * 40 + rb * 120) * level
+        columns[:, 13] = (qb * 100 + rb * 500) * level
+        columns[:, 15] = (qb * 1 + rb * 4) * level
+        columns[:, 17] = (rb * 20 + receiver * 35) * level
+        columns[:, 16] = columns[:, 17] + (rb * 5 + receiver * 20)
+        columns[:, 18] = (rb * 150 + receiver * 450) * level
+        columns[:, 20] = (rb * 1 + receiver * 3) * level
+        columns[:, 21] = rng.integers(0, 4, n)
+        columns[:, 22] = rng.integers(0, 3, n)
+        columns[:, 24] = rng.integers(0, 2, n)
+        columns[:, 25] = qb * rng.integers(0, 2, n)
+
+        df = pd.DataFrame(np.floor(columns).astype(int), columns=CSV_HEADER)
+        df["Player"] = name[rows] + np.where(rng.random(n) < 0.05, "*", "")
+        df["Tm"] = team[rows]
+        df["FantPos"] = position[rows]
+        df["Age"] = debut_age[rows] + _s
+
+        csv = os.path.join(stat_dir, str(first_season_year + _s) + ".csv")
+        with open(csv, "w") as f:
+            f.write(",".join(CSV_GROUPS) + "\n")
+            df.to_csv(f, index=False)
+        seasons_csv.append(csv)
+    return seasons_csv
+
+def measure(stage, memory:bool=True):
+    """
+    Run a pipeline stage, timing it and (optionally) running it again under tracemalloc for its peak
+    memory.
+
+    Returns
+    -------
+    result:
+        Return value of the stage
+    timing: dict
+        Wall-clock seconds and peak traced bytes of the stage
+    """
+    start = time.perf_counter()
+    result = stage()
+    timing = {"seconds": time.perf_counter() - start}
+    if memory:
+        tracemalloc.start()
+        stage()
+        timing["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, timing
+
+def benchmark_pipeline(stat_dir:str, seasons_csv:list, memory:bool=True, cvxpy:bool=True, seed:int=0):
+    """
+    Time each stage of the roster pipeline over the given season csvs.
+
+    Returns
+    -------
+    stages: dict
+        Stage name -> wall-clock seconds and peak traced bytes
+    """
+    stages = dict()
+    rng = np.random.default_rng(seed)
+    years = list(range(len(seasons_csv)))
+
+    # Import the lazily imported solver stack untimed, so no stage measures a first import
+    importlib.import_module("scipy.sparse")
+    if cvxpy:
+        importlib.import_module("cvxpy")
+
+    # CSV parse, binary cache build and cached load
+    season_stats, stages["csv_parse"] = measure(lambda: [read_player_stats(csv) for csv in seasons_csv], memory)
+    cache_dir = os.path.join(stat_dir, ".cache")
+    _, stages["cache_build"] = measure(lambda: [
+        load_season(csv, os.path.join(cache_dir, str(_s))) for _s, csv in enumerate(seasons_csv)
+    ], False)
+    _, stages["cache_load"] = measure(lambda: [
+        load_season(csv, os.path.join(cache_dir, str(_s))) for _s, csv in enumerate(seasons_csv)
+    ], memory)
+
+    # Season merge and projection
+    (index, stats, share, played, unmatched), stages["season_merge"] = measure(lambda: merge_seasons(season_stats),
+                                                                               memory)
+    latest = season_stats[-1]
+    store = PlayerStore(seasons=np.asarray(years), name=latest.name, index=index, team=latest.team,
+                        position=latest.position, age=latest.age, stats=stats, share=share, played=played)
+    value, stages["projection"] = measure(lambda: fantasy_value(merge_player_stats(store)), memory)
+
+    # Drafted-player removal (a tenth of the players, looked up by name; the synthetic seasons have no K or DEF)
+    drafted = rng.choice(store.name, len(store.name) // 10, replace=False).tolist()
+    caps, total_players, dropped = pool_caps(ROSTER_CAPS, store.position)
+    optimizer = RosterOptimizer(store.position, value, caps=caps, total_players=total_players,
+                                backend="cvxpy" if cvxpy else "exact")
+    (rows, missing), stages["drafted_lookup"] = measure(lambda: store.lookup(drafted), memory)
+    _, stages["drafted_removal"] = measure(lambda: optimizer.mark_drafted(rows), memory)
+
+    # Position split
+    _, stages["position_split"] = measure(lambda: split_positions(store.position).partition(value), memory)
+
+    # Exact solver
+    _, stages["exact_solve"] = measure(lambda: solve_cardinality_roster(value, store.position, optimizer.availability,
+                                                                         caps, total_players), memory)
+
+    # cvxpy objective build and solve (first solve includes canonicalization, re-solve reuses it)
+    if cvxpy:
+        _, stages["objective_build"] = measure(optimizer._build_problem, False)
+        _, stages["problem_solve"] = measure(optimizer.solve, False)
+        optimizer.mark_drafted(np.flatnonzero(optimizer.solve())[:1])
+        _, stages["problem_resolve"] = measure(optimizer.solve, False)
+
+        # Team stacking, usage and teammate covariance terms (sparse team-membership matrices)
+        spread = np.sqrt(projection_spread(store)**2 @ scoring_weights(LEAGUE_SCORING)**2)
+        team_optimizer = RosterOptimizer(store.position, value, caps=caps, total_players=total_players,
+                                         backend="cvxpy")
+        team_optimizer.update(available=optimizer.availability)
+        team_optimizer.add_constraint(team_limit(store.team, 4))
+        team_optimizer.add_constraint(quarterback_stack(store.team, store.position))
+        team_optimizer.add_constraint(usage_limit(store.team, store.usage_share(), {"targets": 0.5}))
+        team_optimizer.add_penalty(teammate_penalty(store.team, spread, 1e-3))
+        _, stages["team_build"] = measure(team_optimizer._build_problem, False)
+        _, stages["team_solve"] = measure(team_optimizer.solve, False)
+
+    return stages
+
+def git_commit():
+    """
+    Commit hash of the working tree (None outside a git checkout).
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results:dict, baseline:dict):
+    """
+    Print the time ratio of every stage against a baseline benchmark file.
+    """
+    baseline_runs = {(run["scale"], run["seasons"]): run for run in baseline["runs"]}
+    print("\nRatio vs " + str(baseline.get("commit")) + " (new / old seconds):")
+    for run in results["runs"]:
+        old = baseline_runs.get((run["scale"], run["seasons"]))
+        if old is None:
+            continue
+        print(" " + str(run["scale"]) + "x, " + str(run["seasons"]) + " seasons:")
+        for stage, timing in run["stages"].items():
+            if stage in old["stages"]:
+                print("   -" + stage + ": " + str(round(timing["seconds"] / max(old["stages"][stage]["seconds"], 1e-12), 3)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the roster pipeline on synthetic seasons.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="league sizes as multiples of " + str(LEAGUE_PLAYERS) + " players")
+    parser.add_argument("--seasons", type=int, nargs="+", default=[5, 30], help="numbers of seasons")
+    parser.add_argument("--output", default="benchmark_results.json", help="json file to write results to")
+    parser.add_argument("--compare", help="earlier results json to compare against")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak memory pass")
+    parser.add_argument("--no-cvxpy", action="store_true", help="skip the cvxpy objective build and solve")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "runs": []
+    }
+    for scale in args.scales:
+        for seasons in args.seasons:
+            with tempfile.TemporaryDirectory() as stat_dir:
+                seasons_csv = write_synthetic_seasons(stat_dir, LEAGUE_PLAYERS * scale, seasons, seed=args.seed)
+                stages = benchmark_pipeline(stat_dir, seasons_csv, memory=not args.no_memory,
+                                            cvxpy=not args.no_cvxpy, seed=args.seed)
+            results["runs"].append({
+                "scale": scale,
+                "seasons": seasons,
+                "players": LEAGUE_PLAYERS * scale,
+                "stages": stages
+            })
+            print(str(scale) + "x, " + str(seasons) + " seasons:")
+            for stage, timing in stages.items():
+                print("   -" + stage + ": " + str(round(timing["seconds"], 6)) + " s" +
+                      (", " + str(timing["peak_bytes"]) + " bytes" if "peak_bytes" in timing else ""))
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("\nResults written to " + args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
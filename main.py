@@ -1,11 +1,18 @@
 import numpy as np
-import pandas as pd
-import cvxpy as cp
-from dataclasses import dataclass
+import argparse
+import json
+import os
+import re
+import csv as csv_module
+import contextlib
+import sys
+import time
+from dataclasses import dataclass, field
 from enum import Enum
 
 # Player Cap Definitions
 TOTAL_PLAYERS = 16          # Total players on team
+GAMES_PER_SEASON = 17       # Regular season games per team
 MAX_QB = 3                  # Maximum allowable Quarterbacks
 MIN_QB = 1                  # Minimum allowable Quarterbacks
 MAX_RB = 6                  # Maximum allowable Running Backs
@@ -16,6 +23,27 @@ MAX_TE = 3                  # Maximum allowable Tight Ends
 MIN_TE = 1                  # Minimum allowable Tight Ends
 MAX_K = 1                   # Maximum allowable Kickers
 MIN_K = 1                   # Minimum allowable Kickers
+MAX_DEF = 1                 # Maximum allowable Defenses
+MIN_DEF = 1                 # Minimum allowable Defenses
+
+# Age curves per position (peak age, yearly growth before the peak, yearly decline after the peak)
+AGE_CURVES = {
+    "QB": (29, 0.03, 0.04),
+    "RB": (25, 0.05, 0.10),
+    "WR": (26, 0.05, 0.06),
+    "TE": (27, 0.06, 0.06),
+    "K": (30, 0.01, 0.01),
+}
+
+# Roster caps (minimum, maximum) of each position the solver fills
+ROSTER_CAPS = {
+    "QB": (MIN_QB, MAX_QB),
+    "RB": (MIN_RB, MAX_RB),
+    "WR": (MIN_WR, MAX_WR),
+    "TE": (MIN_TE, MAX_TE),
+    "K": (MIN_K, MAX_K),
+    "DEF": (MIN_DEF, MAX_DEF),
+}
 
 # Points breakdown for league
 PASS_YD_POINTS = 0.05       # Fantasy points per passing yard
@@ -27,6 +55,17 @@ REC_YD_POINTS = 0.1         # Fantasy points per receiving yard
 REC_POINTS = 1              # Fantasy points per reception
 REC_TD_POINTS = 6           # Fantasy points per receiving touchdown
 FUMBLE_POINTS = -2          # Fantasy points per fumble
+TWO_PT_POINTS = 2           # Fantasy points per rushing/receiving 2pt conversion
+TWO_PT_PASS_POINTS = 2      # Fantasy points per passing 2pt conversion
+FG_POINTS = 3               # Fantasy points per field goal made from under 40 yards
+FG_40_POINTS = 4            # Fantasy points per field goal made from 40-49 yards
+FG_50_POINTS = 5            # Fantasy points per field goal made from 50+ yards
+FG_MISS_POINTS = -1         # Fantasy points per field goal missed
+XP_POINTS = 1               # Fantasy points per extra point made
+XP_MISS_POINTS = -1         # Fantasy points per extra point missed
+DEF_GAME_POINTS = 10        # Fantasy points per defense game (a shutout)
+DEF_PTS_ALLOWED_POINTS = -0.4   # Fantasy points per point allowed by a defense
+DEF_TURNOVER_POINTS = 2     # Fantasy points per interception or fumble recovered by a defense
 
 @dataclass
 class Position(Enum):
@@ -37,471 +76,2688 @@ class Position(Enum):
     K = "K"                 # Kicker
     DEF = "DEF"             # Defense
 
+# Statistic columns of each season csv (Pro-Football-Reference fantasy table, column index after skipping the
+# first header row)
+STAT_COLUMNS = {
+    "pass_yds": 9,          # Passing yards
+    "pass_tds": 10,         # Passing touchdowns
+    "pass_ints": 11,        # Passing interceptions
+    "rush_yds": 13,         # Rushing yards
+    "rush_tds": 15,         # Rushing touchdowns
+    "rec_yds": 18,          # Receiving yards
+    "rec_tds": 20,          # Receiving touchdowns
+    "rec_tot": 17,          # Total receptions
+    "fum": 22,              # Fumbles lost
+    "two_pt": 24,           # Rushing/receiving 2pt conversions
+    "two_pt_pass": 25,      # Passing 2pt conversions
+    "rush_att": 12,         # Rushing attempts (carries)
+    "targets": 16,          # Receiving targets
+}
+
+# Kicking statistic columns of the optional <year>_kicking.csv files (Pro-Football-Reference kicking table)
+KICKING_COLUMNS = {
+    "fg_0_19": 8,           # Field goals made from 0-19 yards
+    "fg_20_29": 10,         # Field goals made from 20-29 yards
+    "fg_30_39": 12,         # Field goals made from 30-39 yards
+    "fg_40_49": 14,         # Field goals made from 40-49 yards
+    "fg_50": 16,            # Field goals made from 50+ yards
+    "fg_att": 17,           # Field goals attempted
+    "xp_att": 21,           # Extra points attempted
+    "xp": 22,               # Extra points made
+}
+
+# Team defense statistic columns of the optional <year>_defense.csv files (Pro-Football-Reference team
+# defense table)
+DEFENSE_COLUMNS = {
+    "def_games": 2,         # Games played
+    "def_pts_allowed": 3,   # Points allowed
+    "def_fum_rec": 8,       # Fumbles recovered
+    "def_ints": 14,         # Interceptions
+}
+STATS = list(STAT_COLUMNS) + list(KICKING_COLUMNS) + list(DEFENSE_COLUMNS)
+STAT_INDEX = {stat: _k for _k, stat in enumerate(STATS)}
+
+# Stats shared out among the players of a team (target share, carry share)
+USAGE_STATS = ["targets", "rush_att"]
+
+# Columns of each parsed season (and of its binary cache)
+SEASON_COLUMNS = ("name", "team", "position", "age", "stats")
+
+# Arrays cached for a merged player store
+MERGED_COLUMNS = ("name", "team", "position", "age", "stats", "share", "played", "key", "unmatched_season",
+                  "unmatched_name")
+
+# Layout of each season csv: file name suffix, name/team/position/age columns (None when absent, or a fixed
+# position) and statistic columns. Column indices count after skipping the first header row
+SEASON_LAYOUTS = {
+    "fantasy": {"suffix": "", "name": 1, "team": 2, "position": 3, "age": 4, "stats": STAT_COLUMNS},
+    "kicking": {"suffix": "_kicking", "name": 1, "team": 2, "position": 4, "age": 3, "stats": KICKING_COLUMNS},
+    "defense": {"suffix": "_defense", "name": 1, "team": None, "position": "DEF", "age": None,
+                "stats": DEFENSE_COLUMNS},
+}
+
+# Position codes used by the columnar player store (-1 marks an unknown position)
+POSITIONS = [pos.value for pos in Position]
+POSITION_CODES = {pos: _k for _k, pos in enumerate(POSITIONS)}
+
+class Instrumentation:
+    """
+    Stage timings, counters and solver statistics written as JSON lines. While disabled every hook returns
+    immediately, so instrumented code runs unchanged.
+
+    Parameters
+    ----------
+    stream:
+        Writable text stream for the JSON lines (None disables instrumentation)
+    profile: bool
+        Capture a cProfile of each stage and include its slowest functions
+    memory: bool
+        Trace each stage's peak memory with tracemalloc
+
+    Nested stages share one profiler and one tracemalloc session started by the outermost stage; each stage
+    reports the profile delta over its own span and its traced peak above the memory in use when it started.
+    """
+    def __init__(self, stream=None, profile:bool=False, memory:bool=False):
+        self.configure(stream, profile, memory)
+
+    def configure(self, stream=None, profile:bool=False, memory:bool=False):
+        """
+        Enable instrumentation on the given stream (None disables it).
+        """
+        self.stream = stream
+        self.enabled = stream is not None
+        self.profile = profile
+        self.memory = memory
+        self._stages = []
+        self._profiler = None
+        self._tracing = False
+
+    def emit(self, event:str, **fields):
+        """
+        Write one JSON line.
+        """
+        if self.enabled:
+            self.stream.write(json.dumps({"event": event, "time": time.time(), **fields}, default=str) + "\n")
+            self.stream.flush()
+
+    def stage(self, name:str, **fields):
+        """
+        Context manager timing the enclosed pipeline stage.
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._stage(name, fields)
+
+    @contextlib.contextmanager
+    def _stage(self, name:str, fields:dict):
+        import cProfile
+        import tracemalloc
+
+        # Stages nest (e.g. command -> recommend -> problem.solve), so the outermost stage starts one profiler
+        # and one tracemalloc session and every stage reports its deltas from them
+        outermost = not self._stages
+        if outermost:
+            self._profiler = cProfile.Profile() if self.profile else None
+            self._tracing = self.memory and not tracemalloc.is_tracing()
+            if self._tracing:
+                tracemalloc.start()
+        if self._profiler is not None:
+            if outermost:
+                self._profiler.enable()
+            profile_start = self._profile_snapshot()
+        if self.memory:
+            self._reset_peak()
+        self._stages.append({"peak": 0, "base": tracemalloc.get_traced_memory()[0] if self.memory else 0})
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            frame = self._stages.pop()
+            # Memory first so the profile snapshot does not count towards the stage peak
+            if self.memory:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                fields["peak_bytes"] = peak - frame["base"]
+                if self._stages:
+                    self._stages[-1]["peak"] = max(self._stages[-1]["peak"], peak)
+            if self._profiler is not None:
+                fields["profile"] = self._profile_delta(profile_start, self._profile_snapshot())
+            if outermost:
+                if self._profiler is not None:
+                    self._profiler.disable()
+                if self._tracing:
+                    tracemalloc.stop()
+            self.emit("stage", stage=name, seconds=seconds, **fields)
+
+    def _reset_peak(self):
+        """
+        Fold the traced peak so far into the enclosing stage, then reset it for a new stage.
+        """
+        import tracemalloc
+
+        if self._stages:
+            self._stages[-1]["peak"] = max(self._stages[-1]["peak"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    def _profile_snapshot(self):
+        """
+        Cumulative per-function statistics of the shared profiler (which keeps running).
+        """
+        self._profiler.create_stats()
+        stats = dict(self._profiler.stats)
+        self._profiler.enable()
+        return stats
+
+    @staticmethod
+    def _profile_delta(start:dict, end:dict):
+        """
+        Slowest functions between two profiler snapshots.
+        """
+        import pstats
+
+        delta = []
+        for func, (cc, calls, tottime, cumtime, callers) in end.items():
+            before = start.get(func, (0, 0, 0., 0., None))
+            if calls > before[1]:
+                delta.append((func, calls - before[1], tottime - before[2], cumtime - before[3]))
+        return [
+            {"function": pstats.func_std_string(func), "calls": calls, "tottime": tottime, "cumtime": cumtime}
+            for func, calls, tottime, cumtime in sorted(delta, key=lambda item: -item[3])[:20]
+        ]
+
+    def count(self, name:str, value):
+        """
+        Record a counter (e.g. players loaded).
+        """
+        if self.enabled:
+            self.emit("counter", counter=name, value=value)
+
+    def solver(self, problem):
+        """
+        Record the cvxpy compile time and the backend solver's statistics of a solved problem.
+        """
+        if self.enabled:
+            stats = problem.solver_stats
+            self.emit("solver", solver=stats.solver_name, status=problem.status,
+                      compile_seconds=getattr(problem, "compilation_time", None), solve_seconds=stats.solve_time,
+                      setup_seconds=stats.setup_time, iterations=stats.num_iters)
+
+# Instrumentation used throughout the pipeline (disabled until configured)
+INSTRUMENTATION = Instrumentation()
+
+@dataclass
+class ScoringProfile:
+    name: str               # Profile name
+    points: dict            # Stat -> fantasy points per unit (stats not listed score zero)
+
+    def weights(self):
+        """
+        Fantasy points per unit of each stat, ordered as STATS.
+        """
+        return np.array([float(self.points.get(stat, 0.)) for stat in STATS])
+
+# Scoring for this league, plus common formats that only differ in points per reception
+LEAGUE_SCORING = ScoringProfile("league", {
+    "pass_yds": PASS_YD_POINTS,
+    "pass_tds": PASS_TD_POINTS,
+    "pass_ints": PASS_INT_POINTS,
+    "rush_yds": RUSH_YD_POINTS,
+    "rush_tds": RUSH_TD_POINTS,
+    "rec_yds": REC_YD_POINTS,
+    "rec_tds": REC_TD_POINTS,
+    "rec_tot": REC_POINTS,
+    "fum": FUMBLE_POINTS,
+    "two_pt": TWO_PT_POINTS,
+    "two_pt_pass": TWO_PT_PASS_POINTS,
+    "fg_0_19": FG_POINTS - FG_MISS_POINTS,          # Made field goals are also counted as attempts
+    "fg_20_29": FG_POINTS - FG_MISS_POINTS,
+    "fg_30_39": FG_POINTS - FG_MISS_POINTS,
+    "fg_40_49": FG_40_POINTS - FG_MISS_POINTS,
+    "fg_50": FG_50_POINTS - FG_MISS_POINTS,
+    "fg_att": FG_MISS_POINTS,
+    "xp": XP_POINTS - XP_MISS_POINTS,
+    "xp_att": XP_MISS_POINTS,
+    "def_games": DEF_GAME_POINTS,
+    "def_pts_allowed": DEF_PTS_ALLOWED_POINTS,
+    "def_fum_rec": DEF_TURNOVER_POINTS,
+    "def_ints": DEF_TURNOVER_POINTS,
+})
+SCORING_PROFILES = {
+    "league": LEAGUE_SCORING,
+    "standard": ScoringProfile("standard", {**LEAGUE_SCORING.points, "rec_tot": 0.}),
+    "half_ppr": ScoringProfile("half_ppr", {**LEAGUE_SCORING.points, "rec_tot": 0.5}),
+    "ppr": ScoringProfile("ppr", {**LEAGUE_SCORING.points, "rec_tot": 1.}),
+}
+
+def scoring_weights(profiles):
+    """
+    Given a scoring profile, or a list of them, build the stat weight vector (or stat x profile matrix).
+    """
+    if isinstance(profiles, ScoringProfile):
+        return profiles.weights()
+    return np.stack([profile.weights() for profile in profiles], axis=1)
+
+def fantasy_value(stats:np.ndarray, profiles=LEAGUE_SCORING):
+    """
+    Given stats, compute their fantasy value under one or several scoring profiles.
+
+    Parameters
+    ----------
+    stats: np.ndarray
+        Stat array whose last axis is ordered as STATS (e.g. player x stat or season x player x stat)
+    profiles: ScoringProfile or list
+        Scoring profile, or list of scoring profiles to evaluate together
+
+    Returns
+    -------
+    value: np.ndarray
+        Fantasy value with the stat axis removed, plus a trailing profile axis when a list is given
+    """
+    return stats @ scoring_weights(profiles)
+
+@dataclass
+class SeasonStats:
+    name: np.ndarray        # Player names
+    team: np.ndarray        # Player team abbreviations ("" when unknown, e.g. "2TM" when traded mid-season)
+    position: np.ndarray    # Player position codes
+    age: np.ndarray         # Player ages
+    stats: np.ndarray       # Player x stat matrix ordered as STATS
+
+@dataclass
+class PlayerStore:
+    seasons: np.ndarray     # Season years, oldest first
+    name: np.ndarray        # Player names
+    index: dict             # Normalized player name -> rows of the players sharing it
+    team: np.ndarray        # Player team abbreviation during the latest season
+    position: np.ndarray    # Player position codes
+    age: np.ndarray         # Player age during the latest season
+    stats: np.ndarray       # Season x player x stat totals
+    share: np.ndarray       # Season x player x usage stat shares of the player's team (NaN without a single team)
+    played: np.ndarray      # Season x player mask of seasons played
+    unmatched: dict = field(default_factory=dict)   # Season -> names with no match in the latest season
+
+    @classmethod
+    def from_csvs(cls, seasons_csv:list, seasons:list, cache:bool=True):
+        """
+        Build the store from season csvs. Players are taken from the latest season and earlier seasons
+        are merged onto them.
+
+        Parameters
+        ----------
+        seasons_csv: list
+            Addresses of the season csv files, oldest first
+        seasons: list
+            Season year of each csv file
+        cache: bool
+            Load the merged store from its binary cache (.cache/merged_<first>_<last>/ next to the latest csv,
+            rebuilt whenever a season csv changes) and the parsed seasons from theirs (see load_season)
+
+        Returns
+        -------
+        store: PlayerStore
+            Columnar store of every player from the latest season
+        """
+        # Load the merged store if it was built from these exact csvs (the index is rebuilt from the cached
+        # normalized names, so no name is normalized again)
+        if cache:
+            cache_dir = os.path.join(os.path.dirname(seasons_csv[-1]), ".cache",
+                                     "merged_" + str(seasons[0]) + "_" + str(seasons[-1]))
+            key = {"seasons": [[_season_cache_key(layout_csv, layout) for layout, layout_csv in season_csvs(csv)]
+                               for csv in seasons_csv], "usage": USAGE_STATS}
+            with INSTRUMENTATION.stage("load_merged", seasons=len(seasons_csv)):
+                arrays = _load_cached_arrays(cache_dir, key, MERGED_COLUMNS)
+            if arrays is not None:
+                index = dict()
+                for _i, name_key in enumerate(arrays["key"].tolist()):
+                    index.setdefault(name_key, []).append(_i)
+                unmatched = {season: [] for season in seasons}
+                for _s, name in zip(arrays["unmatched_season"].tolist(), arrays["unmatched_name"].tolist()):
+                    unmatched[seasons[_s]].append(name)
+                return cls(seasons=np.asarray(seasons), name=arrays["name"], index=index, team=arrays["team"],
+                           position=arrays["position"], age=arrays["age"], stats=arrays["stats"],
+                           share=arrays["share"], played=arrays["played"], unmatched=unmatched)
+
+        # Read every season, then merge earlier seasons onto the latest season's players
+        season_stats = []
+        for csv in seasons_csv:
+            with INSTRUMENTATION.stage("read_season", csv=csv, cache=cache):
+                season_stats.append(read_season(csv, cache))
+        with INSTRUMENTATION.stage("merge_seasons", seasons=len(seasons_csv)):
+            index, stats, share, played, unmatched = merge_seasons(season_stats)
+        if INSTRUMENTATION.enabled:
+            INSTRUMENTATION.count("players_loaded", sum(len(season.name) for season in season_stats))
+            INSTRUMENTATION.count("players_merged", int(played.sum()))
+            INSTRUMENTATION.count("players_unmatched", sum(len(names) for names in unmatched))
+        latest = season_stats[-1]
+        if cache:
+            name_key = np.empty(len(latest.name), dtype=object)
+            for key_name, rows in index.items():
+                name_key[rows] = key_name
+            _save_cached_arrays(cache_dir, key, {
+                "name": latest.name, "team": latest.team, "position": latest.position, "age": latest.age,
+                "stats": stats, "share": share, "played": played, "key": name_key.astype(str),
+                "unmatched_season": np.repeat(np.arange(len(unmatched)), [len(names) for names in unmatched]),
+                "unmatched_name": np.array(sum(unmatched, []), dtype=str)
+            })
+
+        return cls(
+            seasons=np.asarray(seasons),
+            name=latest.name,
+            index=index,
+            team=latest.team,
+            position=latest.position,
+            age=latest.age,
+            stats=stats,
+            share=share,
+            played=played,
+            unmatched={season: unmatched[_s] for _s, season in enumerate(seasons)}
+        )
+
+    def find(self, name:str, position:str=None, team:str=None):
+        """
+        Row of the given player name (matched on its normalized key), or None if the player is not in the store.
+
+        Parameters
+        ----------
+        name: str
+            Player name
+        position: str
+            Position (e.g. "TE") telling namesakes apart, None to ignore
+        team: str
+            NFL team abbreviation during the latest season telling namesakes apart, None to ignore
+
+        Returns
+        -------
+        row: int
+            Row of the player, the first of the namesakes the position and team leave tied, or None
+        """
+        # Position and team only break ties between namesakes
+        rows = self.index.get(normalize_name(name), [])
+        if len(rows) > 1 and position is not None:
+            rows = [row for row in rows if self.position[row] == POSITION_CODES.get(position, -1)]
+        if len(rows) > 1 and team is not None:
+            rows = [row for row in rows if self.team[row] == team]
+        return rows[0] if rows else None
+
+    def lookup(self, names:list, positions:list=None, teams:list=None):
+        """
+        Given player names, find their rows.
+
+        Parameters
+        ----------
+        names: list
+            Player names
+        positions: list
+            Position of each player telling namesakes apart (None entries are ignored), None to ignore
+        teams: list
+            NFL team of each player telling namesakes apart (None entries are ignored), None to ignore
+
+        Returns
+        -------
+        rows: np.ndarray
+            Rows of the players found in the store
+        missing: list
+            Names that are not in the store
+        """
+        positions = [None] * len(names) if positions is None else positions
+        teams = [None] * len(names) if teams is None else teams
+        rows = [self.find(name, position, team) for name, position, team in zip(names, positions, teams)]
+        missing = [name for name, row in zip(names, rows) if row is None]
+        return np.array([row for row in rows if row is not None],dtype=np.intp), missing
+
+    def total(self):
+        """
+        Player x stat totals over every season.
+        """
+        return self.stats.sum(axis=0)
+
+    def seasons_played(self):
+        """
+        Number of seasons of data for each player.
+        """
+        return self.played.sum(axis=0)
+
+    def mean(self):
+        """
+        Player x stat averages over the seasons each player played.
+        """
+        return self.total() / np.maximum(self.seasons_played(), 1)[:, None]
+
+    def std(self):
+        """
+        Player x stat standard deviations over the seasons each player played (NaN with fewer than two seasons).
+        """
+        count = self.seasons_played()[:, None]
+        deviation = np.where(self.played[:, :, None], self.stats - self.mean(), 0.)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt((deviation**2).sum(axis=0) / np.where(count > 1, count - 1, 0))
+
+    def usage_share(self):
+        """
+        Player x usage stat (USAGE_STATS) shares of the player's team, averaged over the seasons the player
+        spent on a single team (zero without any).
+        """
+        known = ~np.isnan(self.share)
+        return np.where(known, self.share, 0.).sum(axis=0) / np.maximum(known.sum(axis=0), 1)
+
+    def position_total(self, values=None):
+        """
+        Position x stat sums of the given player x stat values (player averages by default).
+        """
+        values = self.mean() if values is None else values
+        known = self.position >= 0
+        totals = np.zeros((len(POSITIONS),) + values.shape[1:])
+        np.add.at(totals, self.position[known], values[known])
+        return totals
+
+    def position_mean(self, values=None):
+        """
+        Position x stat means of the given player x stat values (player averages by default).
+        """
+        counts = np.bincount(self.position[self.position >= 0], minlength=len(POSITIONS))
+        totals = self.position_total(values)
+        return totals / np.maximum(counts, 1).reshape((-1,) + (1,) * (totals.ndim - 1))
+
 @dataclass
-class player:
-    name: str               # Player name
-    position: Position      # Player position
-    age: float              # Player age
-    pass_yds: float         # Passing yards
-    pass_tds: float         # Passing touchdowns
-    pass_ints: float        # Passing interceptions
-    rush_yds: float         # Rushing yards
-    rush_tds: float         # Rushing touchdowns
-    rec_yds: float          # Receiving yards
-    rec_tds: float          # Receiving touchdowns
-    rec_tot: float          # Total receptions
-    fum: float              # Fumbles lost
-
-def read_player_stats(csv:str):
-    """
-    Given csv containing player stats for a given year, build player profiles.
+class PositionSplit:
+    order: np.ndarray       # Player rows sorted by position code
+    bounds: np.ndarray      # Start of each position's block within order (last entry ends the final block)
+
+    def rows(self, pos:str):
+        """
+        Player rows of the given position.
+        """
+        _k = POSITION_CODES[pos]
+        return self.order[self.bounds[_k]:self.bounds[_k+1]]
+
+    def partition(self, values:np.ndarray):
+        """
+        Given per-player values (rows follow the store), reorder them once by position and return a
+        position -> block dictionary whose blocks are views into the reordered array.
+        """
+        ordered = values[self.order]
+        return {
+            pos: ordered[self.bounds[_k]:self.bounds[_k+1]]
+            for _k, pos in enumerate(POSITIONS)
+        }
+
+def split_positions(position:np.ndarray):
+    """
+    Given player position codes, partition the players by position in a single stable sort.
+
+    Parameters
+    ----------
+    position: np.ndarray
+        Position code of each player (-1 for unknown positions)
+
+    Returns
+    -------
+    split: PositionSplit
+        Sort order and block bounds of every position in POSITIONS
+    """
+    order = np.argsort(position, kind="stable")
+    bounds = np.searchsorted(position[order], np.arange(len(POSITIONS)+1))
+    return PositionSplit(order=order, bounds=bounds)
+
+def _team_codes(team:np.ndarray):
+    """
+    Sorted team abbreviations, the team code of every player on a single team and the mask of those players
+    (blank teams and mid-season trades such as "2TM" have no single team).
+    """
+    team = np.asarray(team, dtype=str)
+    single = (team != "") & ~np.char.endswith(team, "TM")
+    teams, code = np.unique(team[single], return_inverse=True)
+    return teams, code, single
+
+def team_membership(team:np.ndarray):
+    """
+    Given player team abbreviations, build the sparse team x player membership matrix. Players without a
+    single team (blank, or traded mid-season such as "2TM") belong to no team.
+
+    Parameters
+    ----------
+    team: np.ndarray
+        Team abbreviation of each player
+
+    Returns
+    -------
+    teams: np.ndarray
+        Sorted team abbreviations (rows of the membership matrix)
+    membership: scipy.sparse.csr_array
+        Team x player matrix with a one where the player is on the team
+    """
+    from scipy import sparse
+
+    teams, code, single = _team_codes(team)
+    membership = sparse.csr_array((np.ones(len(code)), (code, np.flatnonzero(single))),
+                                  shape=(len(teams), len(team)))
+    return teams, membership
+
+def usage_shares(season:SeasonStats):
+    """
+    Given the stats of a season, find each player's share of their team's usage stats (USAGE_STATS).
+
+    Parameters
+    ----------
+    season: SeasonStats
+        Names, teams, position codes, ages and player x stat matrix of every player in a season
+
+    Returns
+    -------
+    share: np.ndarray
+        Player x usage stat shares (NaN for players without a single team, zero for teams without usage)
+    """
+    teams, code, single = _team_codes(season.team)
+    usage = np.asarray(season.stats)[:, [STAT_INDEX[stat] for stat in USAGE_STATS]][single]
+
+    # Team totals summed by team code and broadcast back to the players
+    team_usage = np.zeros((len(teams), len(USAGE_STATS)))
+    np.add.at(team_usage, code, usage)
+    share = np.full((len(single), len(USAGE_STATS)), np.nan)
+    share[single] = np.divide(usage, team_usage[code], out=np.zeros_like(usage), where=team_usage[code] > 0)
+    return share
+
+def read_player_stats(csv:str, layout:str="fantasy"):
+    """
+    Given csv containing player stats for a given year, build columnar player statistics.
 
     Parameters
     ----------
     csv: str
         Address of csv containing player statistics for a given year
+    layout: str
+        Column layout of the csv (key of SEASON_LAYOUTS)
     
     Returns
     -------
-    draftees: list
-        List of player objects describing each player in the given statistics csv
-    draftee_name: list
-        List of strings containing the player names from the csv file
+    season: SeasonStats
+        Names, teams, position codes, ages and player x stat matrix of every player in the csv
     """
-    # Read csv into dataframe
+    import pandas as pd
+
+    columns = SEASON_LAYOUTS[layout]
+
+    # Read csv into dataframe (ranked rows only, dropping repeated headers and league totals)
     df = pd.read_csv(csv,skiprows=1)
+    df = df[pd.to_numeric(df.iloc[:,0],errors="coerce").notna()]
 
     # Player name
-    draftee_name = df.iloc[:,1].tolist()
-    draftee_name = [n.replace('*','').replace('+','') for n in draftee_name]
+    name = df.iloc[:,columns["name"]].astype(str).str.replace('*','',regex=False).str.replace('+','',regex=False)
+
+    # Player team
+    team = df.iloc[:,columns["team"]].fillna("").astype(str) if columns["team"] is not None else \
+        pd.Series("", index=df.index)
 
-    # Player position
-    draftee_position = df.iloc[:,3].tolist()
+    # Player position (fixed for layouts of a single position)
+    if isinstance(columns["position"], str):
+        position = pd.Series(POSITION_CODES[columns["position"]], index=df.index, dtype=np.int8)
+    else:
+        position = df.iloc[:,columns["position"]].str.upper().map(POSITION_CODES).fillna(-1).astype(np.int8)
 
     # Player age
-    draftee_age = df.iloc[:,4].tolist()
+    age = pd.to_numeric(df.iloc[:,columns["age"]],errors="coerce") if columns["age"] is not None else \
+        pd.Series(np.nan, index=df.index)
+
+    # Player stats ordered as STATS (stats outside the layout and blank entries count as zero)
+    stats = np.zeros((len(df), len(STATS)))
+    stats[:, [STAT_INDEX[stat] for stat in columns["stats"]]] = \
+        df.iloc[:,list(columns["stats"].values())].apply(pd.to_numeric,errors="coerce").fillna(0.).to_numpy(dtype=float)
+
+    return SeasonStats(
+        name=name.to_numpy(dtype=str),
+        team=team.to_numpy(dtype=str),
+        position=position.to_numpy(),
+        age=age.to_numpy(dtype=float),
+        stats=stats
+    )
 
-    # Player passing yards
-    draftee_pass_yds = df.iloc[:,9].tolist()
+def _season_cache_key(csv:str, layout:str):
+    """
+    Key identifying the parsed contents of a season csv: its path, size, modification time and stat layout.
+    """
+    status = os.stat(csv)
+    return {
+        "path": os.path.abspath(csv),
+        "size": status.st_size,
+        "mtime_ns": status.st_mtime_ns,
+        "layout": SEASON_LAYOUTS[layout],
+        "stats": STATS,
+        "columns": list(SEASON_COLUMNS)
+    }
+
+def load_season(csv:str, cache_dir:str=None, layout:str="fantasy"):
+    """
+    Given csv containing player stats for a given year, load its parsed stats from a binary cache. The cache
+    is rebuilt with read_player_stats whenever the csv changes and is memory mapped on later loads.
 
-    # Player passing TDs
-    draftee_pass_tds = df.iloc[:,10].tolist()
+    Parameters
+    ----------
+    csv: str
+        Address of csv containing player statistics for a given year
+    cache_dir: str
+        Directory holding the cached arrays (defaults to .cache/<csv name>/ next to the csv)
+    layout: str
+        Column layout of the csv (key of SEASON_LAYOUTS)
 
-    # Player passing Ints
-    draftee_pass_ints = df.iloc[:,11].tolist()
+    Returns
+    -------
+    season: SeasonStats
+        Names, teams, position codes, ages and player x stat matrix of every player in the csv
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(csv), ".cache", os.path.splitext(os.path.basename(csv))[0])
+    key = _season_cache_key(csv, layout)
 
-    # Player rushing yards
-    draftee_rush_yds = df.iloc[:,13].tolist()
+    # Load the cached arrays if they were built from this exact csv, otherwise parse the csv and rebuild them
+    arrays = _load_cached_arrays(cache_dir, key, SEASON_COLUMNS)
+    if arrays is not None:
+        return SeasonStats(**arrays)
+    with INSTRUMENTATION.stage("read_player_stats", csv=csv):
+        season = read_player_stats(csv, layout)
+    _save_cached_arrays(cache_dir, key, {column: getattr(season, column) for column in SEASON_COLUMNS})
 
-    # Player rushing TDs
-    draftee_rush_tds = df.iloc[:,15].tolist()
+    return season
 
-    # Player receiving yards
-    draftee_rec_yds = df.iloc[:,18].tolist()
+def _load_cached_arrays(cache_dir:str, key, columns:tuple):
+    """
+    Memory map the cached arrays of the given columns, or None unless they were built for the given key.
+    """
+    try:
+        with open(os.path.join(cache_dir, "key.json")) as f:
+            cached_key = json.load(f)
+    except (OSError, ValueError):
+        cached_key = None
+    if cached_key != key:
+        return None
+    return {column: np.load(os.path.join(cache_dir, column + ".npy"), mmap_mode="r") for column in columns}
+
+def _save_cached_arrays(cache_dir:str, key, arrays:dict):
+    """
+    Cache the given column -> array mapping under the given key. The key is written last so partial caches
+    are never used, and each array is written to a temporary file and renamed into place, so arrays memory
+    mapped by earlier loads keep their old files.
+    """
+    key_file = os.path.join(cache_dir, "key.json")
+    os.makedirs(cache_dir, exist_ok=True)
+    if os.path.exists(key_file):
+        os.remove(key_file)
+    for column, array in arrays.items():
+        temporary = os.path.join(cache_dir, column + "." + str(os.getpid()) + ".tmp")
+        with open(temporary, "wb") as f:
+            np.save(f, array)
+        os.replace(temporary, os.path.join(cache_dir, column + ".npy"))
+    with open(key_file, "w") as f:
+        json.dump(key, f)
+
+def season_csvs(csv:str):
+    """
+    Layout and address of the csvs making up a season: the fantasy csv plus the kicking and defense csvs of
+    the same year (<year>_kicking.csv and <year>_defense.csv) where they exist.
+    """
+    csvs = []
+    for layout, columns in SEASON_LAYOUTS.items():
+        layout_csv = os.path.splitext(csv)[0] + columns["suffix"] + os.path.splitext(csv)[1]
+        if layout == "fantasy" or os.path.exists(layout_csv):
+            csvs.append((layout, layout_csv))
+    return csvs
+
+def read_season(csv:str, cache:bool=True):
+    """
+    Given csv containing player stats for a given year, read it together with the kicking and defense csvs
+    of the same year (<year>_kicking.csv and <year>_defense.csv) where they exist.
 
-    # Player receptions
-    draftee_rec_tot = df.iloc[:,17].tolist()
+    Parameters
+    ----------
+    csv: str
+        Address of csv containing player statistics for a given year
+    cache: bool
+        Load the parsed csvs from their binary cache (see load_season)
 
-    # Player receiving TDs
-    draftee_rec_tds = df.iloc[:,20].tolist()
+    Returns
+    -------
+    season: SeasonStats
+        Names, teams, position codes, ages and player x stat matrix of every player in the csvs
+    """
+    seasons = [load_season(layout_csv, layout=layout) if cache else read_player_stats(layout_csv, layout)
+               for layout, layout_csv in season_csvs(csv)]
+    if len(seasons) == 1:
+        return seasons[0]
+    return SeasonStats(**{
+        column: np.concatenate([getattr(season, column) for season in seasons])
+        for column in SEASON_COLUMNS
+    })
+
+def _is_number(text:str):
+    """
+    Whether the csv field parses as a number.
+    """
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
 
-    # Player fumbles (unrecovered)
-    draftee_fum = df.iloc[:,22].tolist()
+def read_weekly_stats(csv:str):
+    """
+    Given csv containing player stats for a single week (same layout as the season csvs), stream its
+    records without loading the whole file.
 
-    # Create player profiles
-    draftees = list()
-    for _i in range(len(draftee_name)):
-        draftees.append(player(
-            name=str(draftee_name[_i]),
-            position=str(draftee_position[_i]),
-            age=float(draftee_age[_i]),
-            pass_yds=float(draftee_pass_yds[_i]),
-            pass_tds=float(draftee_pass_tds[_i]),
-            pass_ints=float(draftee_pass_ints[_i]),
-            rush_yds=float(draftee_rush_yds[_i]),
-            rush_tds=float(draftee_rush_tds[_i]),
-            rec_yds=float(draftee_rec_yds[_i]),
-            rec_tds=float(draftee_rec_tds[_i]),
-            rec_tot=float(draftee_rec_tot[_i]),
-            fum=float(draftee_fum[_i])
-        ))
+    Parameters
+    ----------
+    csv: str
+        Address of csv containing player statistics for a given week
+
+    Yields
+    ------
+    name: str
+        Player name
+    position: int
+        Player position code
+    stats: np.ndarray
+        Player stats ordered as STATS (stats outside STAT_COLUMNS and blank entries count as zero)
+    """
+    columns = list(STAT_COLUMNS.values())
+    with open(csv, newline="") as f:
+        rows = csv_module.reader(f)
+        next(rows, None)
+        next(rows, None)
+        for row in rows:
+            # Ranked rows only (drops repeated headers and league totals, as read_player_stats does)
+            if len(row) <= max(columns) or not row[1] or not _is_number(row[0]):
+                continue
+            stats = np.zeros(len(STATS))
+            for stat, column in STAT_COLUMNS.items():
+                try:
+                    stats[STAT_INDEX[stat]] = float(row[column])
+                except ValueError:
+                    pass
+            yield row[1].replace('*','').replace('+',''), POSITION_CODES.get(row[3], -1), stats
+
+class RunningStats:
+    """
+    Running per-player stat totals, game counts and Welford means/variances, updated in place as weekly
+    stat records arrive.
 
-    return draftees,draftee_name
+    Parameters
+    ----------
+    capacity: int
+        Initial number of player rows (grown by doubling as new players appear)
+    """
+    def __init__(self, capacity:int=1024):
+        self.index = dict()
+        self.name = []
+        self.position = np.full(capacity, -1, dtype=np.int8)
+        self.games = np.zeros(capacity, dtype=np.int64)
+        self.total = np.zeros((capacity, len(STATS)))
+        self.mean = np.zeros((capacity, len(STATS)))
+        self.m2 = np.zeros((capacity, len(STATS)))
+
+    def __len__(self):
+        return len(self.name)
+
+    def _row(self, name:str, position:int):
+        """
+        Row of the given player, adding the player (and growing the arrays) when first seen.
+        """
+        key = normalize_name(name)
+        row = self.index.get(key)
+        if row is None:
+            row = len(self.name)
+            if row == len(self.games):
+                for attr in ("position", "games", "total", "mean", "m2"):
+                    array = getattr(self, attr)
+                    grown = np.zeros((2*len(array),) + array.shape[1:], dtype=array.dtype)
+                    grown[:len(array)] = array
+                    setattr(self, attr, grown)
+                self.position[row:] = -1
+            self.index[key] = row
+            self.name.append(name)
+        if position >= 0:
+            self.position[row] = position
+        return row
+
+    def update(self, records):
+        """
+        Given (name, position, stats) records of one week (e.g. from read_weekly_stats), add them to the
+        running aggregates. Cost is proportional to the number of records.
+        """
+        rows, stats = [], []
+        for name, position, record_stats in records:
+            rows.append(self._row(name, position))
+            stats.append(record_stats)
+        if not rows:
+            return
+        rows = np.array(rows, dtype=np.intp)
+        stats = np.array(stats, dtype=float)
+
+        # Vectorized Welford update, split into rounds so a player listed twice is updated in order
+        while len(rows):
+            first = np.unique(rows, return_index=True)[1]
+            batch_rows, batch_stats = rows[first], stats[first]
+            self.games[batch_rows] += 1
+            self.total[batch_rows] += batch_stats
+            delta = batch_stats - self.mean[batch_rows]
+            self.mean[batch_rows] += delta / self.games[batch_rows, None]
+            self.m2[batch_rows] += delta * (batch_stats - self.mean[batch_rows])
+            rest = np.ones(len(rows), dtype=bool)
+            rest[first] = False
+            rows, stats = rows[rest], stats[rest]
+
+    def ingest_week(self, csv:str):
+        """
+        Given csv containing player stats for a single week, add it to the running aggregates.
+        """
+        self.update(read_weekly_stats(csv))
+
+    def variance(self):
+        """
+        Player x stat per-game sample variances (NaN with fewer than two games).
+        """
+        games = self.games[:len(self), None]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.m2[:len(self)] / np.where(games > 1, games - 1, 0)
+
+    def projection(self, games:int=GAMES_PER_SEASON):
+        """
+        Player x stat season projections from the running per-game means.
+        """
+        return self.mean[:len(self)] * games
+
+    def save(self, path:str):
+        """
+        Save the running aggregates so ingestion can continue in a later run (written to path exactly,
+        without np.savez appending .npz).
+        """
+        n = len(self)
+        with open(path, "wb") as f:
+            np.savez(f, name=np.array(self.name, dtype=str), position=self.position[:n], games=self.games[:n],
+                     total=self.total[:n], mean=self.mean[:n], m2=self.m2[:n], stats=np.array(STATS))
+
+    @classmethod
+    def load(cls, path:str):
+        """
+        Load running aggregates saved with save.
+        """
+        with np.load(path) as data:
+            if data["stats"].tolist() != STATS:
+                raise ValueError("Running stats in " + path + " were saved with different stat columns")
+            running = cls(capacity=max(2*len(data["name"]), 1))
+            for name, position in zip(data["name"].tolist(), data["position"]):
+                running._row(name, int(position))
+            n = len(running)
+            running.games[:n] = data["games"]
+            running.total[:n] = data["total"]
+            running.mean[:n] = data["mean"]
+            running.m2[:n] = data["m2"]
+        return running
+
+# Name suffixes ignored when matching players across seasons
+NAME_SUFFIXES = {"jr", "sr", "ii", "iii", "iv", "v"}
+
+def normalize_name(name:str):
+    """
+    Given a player name, build the key used to match the player across seasons.
 
-def merge_player_stats():
+    Parameters
+    ----------
+    name: str
+        Player name as written in a season csv
+
+    Returns
+    -------
+    key: str
+        Lower case name with award markers (*, +), punctuation and generational suffixes removed
     """
-    Given a list of the 
+    words = re.sub(r"[*+.,'’]", "", str(name)).lower().split()
+    while len(words) > 1 and words[-1] in NAME_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+def join_season(index:dict, position:np.ndarray, season:SeasonStats):
     """
+    Given the players of the latest season, find the row of each player of another season. Players join on
+    the normalized name; the position only breaks ties between namesakes, so position changes and blank
+    positions keep their history.
 
-if __name__ == "__main__":
-    # Inputs
-    first_season_year = 2020
-    current_season_year = 2024
-    drafted_players_csv = "players_drafted.csv"
+    Parameters
+    ----------
+    index: dict
+        Normalized player name -> rows of the latest season sharing it
+    position: np.ndarray
+        Position codes of the latest season
+    season: SeasonStats
+        Season to join
 
-    # Get data csv files
-    stat_dir = "Player_Statistics/"
-    seasons_csv = [stat_dir+str(season)+".csv" for season in range(first_season_year,current_season_year)]
+    Returns
+    -------
+    rows: np.ndarray
+        Latest season row of each player of the season, -1 when the name is unknown, when namesakes share the
+        position, or when several players of the season join the same row and the position does not single one
+        out
+    """
+    rows = np.full(len(season.name), -1, dtype=np.intp)
+    for _i, (name, pos) in enumerate(zip(season.name, season.position)):
+        candidates = index.get(normalize_name(name), [])
+        if len(candidates) > 1:
+            candidates = [row for row in candidates if position[row] == pos]
+        if len(candidates) == 1:
+            rows[_i] = candidates[0]
+
+    # Rows matched more than once keep the one player of the row's position, the rest are reported rather
+    # than summed
+    _, inverse, counts = np.unique(rows, return_inverse=True, return_counts=True)
+    shared = (rows >= 0) & (counts[inverse] > 1)
+    same_position = shared & (season.position == position[np.maximum(rows, 0)])
+    claims = np.bincount(rows[same_position], minlength=len(position))
+    rows[shared & ~(same_position & (claims[np.maximum(rows, 0)] == 1))] = -1
+    return rows
+
+def merge_seasons(season_stats:list):
+    """
+    Given the stats for several seasons, join every season onto the players of the latest season. Every row
+    of the latest season is its own player; earlier seasons join on the normalized name (see join_season).
 
-    # Get all potential players to draft (for now no rookies, only players from last year)
-    # Read last years data TODO Add 2pt conversions?
-    df = pd.read_csv(seasons_csv[-1],skiprows=1)
-    drafted_players = pd.read_csv(drafted_players_csv, header=None).values.flatten().tolist()
+    Parameters
+    ----------
+    season_stats: list
+        SeasonStats for each season, oldest first
 
-    # Player name
-    draftee_name = df.iloc[:,1].tolist()
-    draftee_name = [n.replace('*','').replace('+','') for n in draftee_name]
+    Returns
+    -------
+    index: dict
+        Normalized player name -> rows of the latest season sharing it
+    stats: np.ndarray
+        Season x player x stat totals
+    share: np.ndarray
+        Season x player x usage stat shares of the player's team (NaN without a single team)
+    played: np.ndarray
+        Season x player mask of seasons played
+    unmatched: list
+        Names in each earlier season without a single match in the latest season
+    """
+    # Latest season defines the players
+    latest = season_stats[-1]
+    index = dict()
+    for _i, name in enumerate(latest.name):
+        index.setdefault(normalize_name(name), []).append(_i)
+
+    stats = np.zeros((len(season_stats), len(latest.name), len(STATS)))
+    share = np.full((len(season_stats), len(latest.name), len(USAGE_STATS)), np.nan)
+    played = np.zeros((len(season_stats), len(latest.name)), dtype=bool)
+    unmatched = [[] for _ in season_stats]
+
+    # Join each earlier season; unmatched and ambiguous players are reported rather than summed
+    for _s, season in enumerate(season_stats):
+        if _s == len(season_stats) - 1:
+            rows = np.arange(len(latest.name))
+        else:
+            rows = join_season(index, latest.position, season)
+        found = rows >= 0
+        stats[_s, rows[found]] = season.stats[found]
+        share[_s, rows[found]] = usage_shares(season)[found]
+        played[_s, rows[found]] = True
+        unmatched[_s] = season.name[~found].tolist()
+
+    return index, stats, share, played, unmatched
+
+def age_adjustment(store:PlayerStore, age_curves:dict=AGE_CURVES):
+    """
+    Given a player store, find the factor scaling each season's stats to the production expected at the
+    player's age next season.
 
-    # Player position
-    draftee_position = df.iloc[:,3].tolist()
+    Parameters
+    ----------
+    store: PlayerStore
+        Player statistics to project from
+    age_curves: dict
+        Position -> (peak age, yearly growth before the peak, yearly decline after the peak)
 
-    # Player age
-    draftee_age = df.iloc[:,4].tolist()
-    draftee_age = [float(age)+1. for age in draftee_age]
+    Returns
+    -------
+    factor: np.ndarray
+        Season x player multiplier (1 for unknown ages and positions without an age curve)
+    """
+    curves = np.zeros((len(POSITIONS)+1, 3))
+    for pos, curve in age_curves.items():
+        curves[POSITION_CODES[pos]] = curve
+    peak, growth, decline = curves[store.position].T
 
-    # Player passing yards
-    draftee_pass_yds = df.iloc[:,9].tolist()
-    draftee_pass_yds = [float(yds) for yds in draftee_pass_yds]
+    def level(age):
+        # Relative production at each age (log scale)
+        return -growth * np.maximum(peak - age, 0.) - decline * np.maximum(age - peak, 0.)
 
-    # Player passing TDs
-    draftee_pass_tds = df.iloc[:,10].tolist()
-    draftee_pass_tds = [float(tds) for tds in draftee_pass_tds]
+    season_age = store.age[None,:] - (store.seasons[-1] - store.seasons)[:,None]
+    factor = np.exp(level(store.age + 1.)[None,:] - level(season_age))
+    return np.where(np.isfinite(factor), factor, 1.)
 
-    # Player passing Ints
-    draftee_pass_ints = df.iloc[:,11].tolist()
-    draftee_pass_ints = [float(ints) for ints in draftee_pass_ints]
+def merge_player_stats(store:PlayerStore, half_life:float=None, age_curves:dict=None, regression:float=0.):
+    """
+    Given a player store, project every player's stats for the upcoming season. The plain projection is
+    the mean over the seasons played; each option below adjusts it within the same vectorized pass over
+    the season x player x stat array.
 
-    # Player rushing yards
-    draftee_rush_yds = df.iloc[:,13].tolist()
-    draftee_rush_yds = [float(yds) for yds in draftee_rush_yds]
+    Parameters
+    ----------
+    store: PlayerStore
+        Player statistics to project from
+    half_life: float
+        Seasons over which a season's weight halves (None weights every season equally)
+    age_curves: dict
+        Position -> (peak age, yearly growth before the peak, yearly decline after the peak) used to scale
+        each season to the player's age next season (None for no age adjustment)
+    regression: float
+        Seasons of positional-average production blended into each projection (0 for no regression)
 
-    # Player rushing TDs
-    draftee_rush_tds = df.iloc[:,15].tolist()
-    draftee_rush_tds = [float(tds) for tds in draftee_rush_tds]
+    Returns
+    -------
+    projection: np.ndarray
+        Player x stat projections for the upcoming season
+    """
+    # Season weights (recency weighted when a half-life is given)
+    weights = store.played.astype(float)
+    if half_life is not None:
+        weights *= (0.5 ** ((store.seasons[-1] - store.seasons) / half_life))[:,None]
 
-    # Player receiving yards
-    draftee_rec_yds = df.iloc[:,18].tolist()
-    draftee_rec_yds = [float(yds) for yds in draftee_rec_yds]
+    # Season stats scaled to next season's age
+    factor = weights if age_curves is None else weights * age_adjustment(store, age_curves)
+    projection = np.einsum("sp,spk->pk", factor, store.stats) / np.maximum(weights.sum(axis=0), 1e-12)[:,None]
 
-    # Player receptions
-    draftee_rec_tot = df.iloc[:,17].tolist()
-    draftee_rec_tot = [float(rec) for rec in draftee_rec_tot]
+    # Regress toward the positional mean in proportion to the seasons of data
+    if regression > 0.:
+        seasons = store.seasons_played()
+        shrink = np.where(store.position >= 0, seasons / (seasons + regression), 1.)[:,None]
+        position_mean = np.vstack((store.position_mean(projection), np.zeros((1, len(STATS)))))
+        projection = shrink * projection + (1. - shrink) * position_mean[store.position]
 
-    # Player receiving TDs
-    draftee_rec_tds = df.iloc[:,20].tolist()
-    draftee_rec_tds = [float(tds) for tds in draftee_rec_tds]
+    return projection
 
-    # Player fumbles (unrecovered)
-    draftee_fum = df.iloc[:,22].tolist()
-    draftee_fum = [float(fum) for fum in draftee_fum]
+def _prefix_values(value:np.ndarray, rows:np.ndarray, max_count:int):
+    """
+    Given the rows of one position, keep its best max_count players sorted by value (best first) along
+    with the prefix sums of their values (prefix[c] is the value of the best c players).
+    """
+    if len(rows) > max_count:
+        rows = rows[np.argpartition(-value[rows], max_count)[:max_count]] if max_count > 0 else rows[:0]
+    rows = rows[np.argsort(-value[rows], kind="stable")]
+    return rows, np.concatenate(([0.], np.cumsum(value[rows])))
 
-    # Player seasons of data
-    draftee_seasons = [1] * len(draftee_name)
+def _combine_counts(best:np.ndarray, prefix:np.ndarray, min_count:int):
+    """
+    Given the best value of every roster size from some positions and the prefix sums of another position,
+    find the best value of every roster size with that position added and the count taken from it.
+    """
+    size = np.arange(len(best))
+    taken = np.arange(min_count, min(len(prefix), len(best)))
+    if len(taken) == 0:
+        return np.full(len(best), -np.inf), np.full(len(best), -1)
+
+    # Candidate value of every (count taken, roster size) pair, best count per roster size
+    rest = size[None,:] - taken[:,None]
+    candidate = np.where(rest >= 0, best[np.maximum(rest, 0)] + prefix[taken][:,None], -np.inf)
+    choice = np.argmax(candidate, axis=0)
+    combined = candidate[choice, size]
+    count = np.where(np.isfinite(combined), taken[choice], -1)
+    return combined, count
+
+def solve_cardinality_roster(value:np.ndarray, position:np.ndarray, available:np.ndarray=None,
+                             caps:dict=ROSTER_CAPS, total_players:int=TOTAL_PLAYERS):
+    """
+    Exactly solve the roster problem when its only constraints are per-position and total player counts.
+    Each position's players are sorted by value and a small dynamic program over roster size picks how
+    many players to take from each position.
 
-    # Now step through the rest of the data and add to the data
-    for _i in range(len(seasons_csv)-1):
-        # Read data csv
-        df = pd.read_csv(seasons_csv[-1],skiprows=1)
+    Parameters
+    ----------
+    value: np.ndarray
+        Projected fantasy value of each player
+    position: np.ndarray
+        Position code of each player
+    available: np.ndarray
+        Mask of players that can be drafted (all players by default)
+    caps: dict
+        Position -> (minimum, maximum) players on the roster
+    total_players: int
+        Total players on the roster
 
-        # Player name
-        name_temp = df.iloc[:,1].tolist()
-        name_temp = [n.replace('*','').replace('+','') for n in name_temp]
+    Returns
+    -------
+    roster: np.ndarray
+        Mask of the players on the optimal roster
+    objective: float
+        Total projected value of the optimal roster
+    """
+    value = np.asarray(value,dtype=float)
+    candidates = np.ones(len(value),dtype=bool) if available is None else np.asarray(available,dtype=bool)
+
+    # Best players of each position and the best roster value of every size
+    best = np.full(total_players+1, -np.inf)
+    best[0] = 0.
+    ranked, counts = [], []
+    for pos, (min_count, max_count) in caps.items():
+        rows, prefix = _prefix_values(value, np.flatnonzero((position == POSITION_CODES[pos]) & candidates),
+                                      max_count)
+        best, count = _combine_counts(best, prefix, min_count)
+        ranked.append(rows)
+        counts.append(count)
+    if not np.isfinite(best[total_players]):
+        raise ValueError("Roster problem is infeasible")
+
+    # Walk back through the positions to recover how many players each one contributes
+    roster = np.zeros(len(value),dtype=bool)
+    size = total_players
+    for rows, count in zip(ranked[::-1], counts[::-1]):
+        roster[rows[:count[size]]] = True
+        size -= count[size]
+    return roster, float(best[total_players])
+
+def _combine_best(first:np.ndarray, second:np.ndarray):
+    """
+    Given the best value of every roster size from two disjoint groups of positions, find the best value
+    of every roster size over both groups.
+    """
+    size = np.arange(len(first))
+    rest = size[:,None] - size[None,:]
+    return np.where(rest >= 0, first[None,:] + second[np.maximum(rest, 0)], -np.inf).max(axis=1)
 
-        # Player passing yards
-        pass_yds_temp = df.iloc[:,9].tolist()
-        pass_yds_temp = [float(yds) for yds in pass_yds_temp]
+def roster_value_drop(value:np.ndarray, position:np.ndarray, available:np.ndarray=None,
+                      caps:dict=ROSTER_CAPS, total_players:int=TOTAL_PLAYERS):
+    """
+    Given the cardinality-only roster problem, find how much the optimal roster value drops if each player
+    is taken by someone else. Every other position's best values are combined once, so each position's
+    drops come from its sorted prefix sums alone instead of re-solving the problem per player.
 
-        # Player passing TDs
-        pass_tds_temp = df.iloc[:,10].tolist()
-        pass_tds_temp = [float(tds) for tds in pass_tds_temp]
+    Parameters
+    ----------
+    value: np.ndarray
+        Projected fantasy value of each player
+    position: np.ndarray
+        Position code of each player
+    available: np.ndarray
+        Mask of players that can be drafted (all players by default)
+    caps: dict
+        Position -> (minimum, maximum) players on the roster
+    total_players: int
+        Total players on the roster
 
-        # Player passing Ints
-        pass_ints_temp = df.iloc[:,11].tolist()
-        pass_ints_temp = [float(ints) for ints in pass_ints_temp]
+    Returns
+    -------
+    drop: np.ndarray
+        Optimal roster value lost without each player (0 off the optimal roster, inf if the roster becomes
+        infeasible)
+    """
+    value = np.asarray(value,dtype=float)
+    candidates = np.ones(len(value),dtype=bool) if available is None else np.asarray(available,dtype=bool)
+    size = np.arange(total_players+1)
+
+    # Best value of every roster size from each position alone (one spare player kept as replacement)
+    ranked, prefixes, best = [], [], []
+    for pos, (min_count, max_count) in caps.items():
+        rows, prefix = _prefix_values(value, np.flatnonzero((position == POSITION_CODES[pos]) & candidates),
+                                      max_count+1)
+        padded = np.concatenate((prefix, np.full(total_players+2, -np.inf)))
+        ranked.append(rows)
+        prefixes.append(padded)
+        best.append(np.where((size >= min_count) & (size <= max_count), padded[:total_players+1], -np.inf))
+
+    # Best value of every roster size from all other positions
+    start = np.full(total_players+1, -np.inf)
+    start[0] = 0.
+    before = [start]
+    for position_best in best[:-1]:
+        before.append(_combine_best(before[-1], position_best))
+    after = [start]
+    for position_best in best[:0:-1]:
+        after.append(_combine_best(after[-1], position_best))
+    others = [_combine_best(before[_p], after[len(best)-1-_p]) for _p in range(len(best))]
+    optimum = np.max(best[0] + others[0][::-1])
+
+    # Value drop for removing each player that could be on the roster
+    drop = np.zeros(len(value))
+    for rows, padded, others_best, (min_count, max_count) in zip(ranked, prefixes, others, caps.values()):
+        ranks = np.arange(min(len(rows), max_count))
+        removed = np.where(size[None,:] <= ranks[:,None], padded[size][None,:],
+                           padded[size+1][None,:] - value[rows[ranks]][:,None])
+        removed = np.where((size >= min_count) & (size <= max_count), removed, -np.inf)
+        drop[rows[ranks]] = optimum - np.max(removed + others_best[::-1], axis=1)
+    return drop
+
+def residual_caps(caps:dict, counts, total_players:int=TOTAL_PLAYERS):
+    """
+    Given the position caps and the players already on a roster, find the caps left for the rest of it.
+
+    Parameters
+    ----------
+    caps: dict
+        Position -> (minimum, maximum) players on the roster
+    counts:
+        Players already on the roster at each position, ordered as caps
+    total_players: int
+        Total players on the roster
+
+    Returns
+    -------
+    caps: dict
+        Position -> (minimum, maximum) players still to add
+    total_players: int
+        Players still to add
+    """
+    residual = {
+        pos: (max(min_count - int(count), 0), max_count - int(count))
+        for (pos, (min_count, max_count)), count in zip(caps.items(), counts)
+    }
+    remaining = total_players - int(np.sum(counts))
+    if any(max_count < 0 for min_count, max_count in residual.values()) or \
+            remaining < sum(min_count for min_count, max_count in residual.values()):
+        raise ValueError("Roster problem is infeasible")
+    return residual, remaining
+
+def pool_caps(caps:dict, position:np.ndarray, total_players:int=TOTAL_PLAYERS):
+    """
+    Given the position caps, drop the positions without a single player in the pool (e.g. seasons without
+    kicking or defense csvs), leaving their minimum roster slots open.
+
+    Parameters
+    ----------
+    caps: dict
+        Position -> (minimum, maximum) players on the roster
+    position: np.ndarray
+        Position code of each player in the pool
+    total_players: int
+        Total players on the roster
+
+    Returns
+    -------
+    caps: dict
+        Position -> (minimum, maximum) players of the positions in the pool
+    total_players: int
+        Players on the roster from those positions
+    dropped: list
+        Positions dropped from the caps
+    """
+    counts = np.bincount(position[position >= 0], minlength=len(POSITIONS))
+    dropped = [pos for pos in caps if counts[POSITION_CODES[pos]] == 0]
+    return {pos: caps[pos] for pos in caps if pos not in dropped}, \
+        total_players - sum(caps[pos][0] for pos in dropped), dropped
+
+class RosterOptimizer:
+    """
+    Roster problem over every player in a store. With only position and total player counts it is solved
+    exactly by solve_cardinality_roster; otherwise (or on request) it is a cvxpy MILP built once, whose
+    projected values and availability are parameters so re-solves reuse the compiled problem. The MILP has
+    a single boolean variable stacked over the players of every capped position, and the position caps are
+    one sparse position-incidence product. Players already on our roster can be kept with mark_kept.
+
+    Without extra constraints or penalties the caps and the total form an interval matrix, which is totally
+    unimodular, so the LP relaxation is solved instead with HiGHS, whose simplex stops on an integral optimum
+    vertex (about 5 ms per re-solve at 600 players). A re-solve that still lands off a vertex (e.g. a solver
+    without crossover passed to solve, on tied values) is solved as a MILP for that call only. MILPs with team terms take about 120-180 ms per re-solve at 600
+    players and seconds at 6000, nearly all of it HiGHS time.
+
+    Parameters
+    ----------
+    position: np.ndarray
+        Position code of each player
+    value: np.ndarray
+        Projected fantasy value of each player (can be set later with update)
+    caps: dict
+        Position -> (minimum, maximum) players on the roster
+    total_players: int
+        Total players on the roster
+    backend: str
+        "exact", "cvxpy", or "auto" to use the exact solver unless extra constraints or penalties have been
+        added
+    """
+    def __init__(self, position:np.ndarray, value:np.ndarray=None, caps:dict=ROSTER_CAPS,
+                 total_players:int=TOTAL_PLAYERS, backend:str="auto"):
+        if backend not in ("auto", "exact", "cvxpy"):
+            raise ValueError("Unknown roster backend: " + str(backend))
+        self.position = position
+        self.split = split_positions(position)
+        self.caps = caps
+        self.total_players = total_players
+        self.backend = backend
+        self.rows = {pos: self.split.rows(pos) for pos in caps}
+        self.candidates = np.flatnonzero(np.isin(position, [POSITION_CODES[pos] for pos in caps]))
+        self.extra_constraints = []
+        self.penalties = []
+        self.relax = True
+        self.problem = None
+        self.objective = None
+
+        self.value = np.zeros(len(position))
+        self.availability = np.ones(len(position),dtype=bool)
+        self.kept = np.zeros(len(position),dtype=bool)
+        self.update(value=value, available=self.availability)
+
+    def _build_problem(self):
+        """
+        Build the cvxpy MILP with one boolean variable and value, availability and kept parameters over the
+        candidate players (players of the capped positions, in store order).
+        """
+        import cvxpy as cp
+
+        # Relax the booleans while the constraint matrix stays totally unimodular
+        players = len(self.candidates)
+        self.relaxed = self.relax and not (self.extra_constraints or self.penalties)
+        self.variable = cp.Variable(players,boolean=not self.relaxed)
+        self.values = cp.Parameter(players)
+        self.available = cp.Parameter(players,nonneg=True)
+        self.keep = cp.Parameter(players,nonneg=True)
+        obj, constraints = self._cap_terms(self.variable)
+        for build in self.extra_constraints:
+            constraints += build(self)
+        for build in self.penalties:
+            penalty, penalty_constraints = build(self)
+            obj -= penalty
+            constraints += penalty_constraints
+
+        self.problem = cp.Problem(
+            objective=cp.Maximize(obj),
+            constraints=constraints
+        )
+        self.milp = None
+        self._value_changed = self._availability_changed = True
+
+    def _cap_terms(self, variable):
+        """
+        Objective and position and total cap constraints over the given candidate variable.
+        """
+        import cvxpy as cp
+        from scipy import sparse
+
+        # Position x candidate incidence matrix and the caps of each row
+        players = len(self.candidates)
+        cap_codes = np.full(len(POSITIONS), -1)
+        cap_codes[[POSITION_CODES[pos] for pos in self.caps]] = np.arange(len(self.caps))
+        incidence = sparse.csr_array((np.ones(players), (cap_codes[self.position[self.candidates]],
+                                                         np.arange(players))), shape=(len(self.caps), players))
+        min_counts, max_counts = np.array(list(self.caps.values())).reshape(-1, 2).T
+        counts = incidence @ variable
+
+        # Create objective (maximize fantasy value)
+        obj = self.values@variable
+
+        # Constrain the problem (unavailable players are bounded to zero, kept players to one)
+        constraints = [
+            variable <= self.available,
+            variable >= self.keep,
+            counts >= min_counts,
+            counts <= max_counts,
+            cp.sum(variable) == self.total_players
+        ]
+        return obj, constraints
+
+    def add_constraint(self, build):
+        """
+        Add constraints beyond the position counts (e.g. salary caps or bye weeks). build is called with
+        the optimizer once the cvxpy problem is built and returns a list of constraints on its variable.
+        Problems with extra constraints are always solved with cvxpy.
+        """
+        if self.backend == "exact":
+            raise ValueError("The exact roster backend only supports position and total player counts")
+        self.extra_constraints.append(build)
+        self.problem = None
+
+    def add_penalty(self, build):
+        """
+        Subtract a penalty from the roster value (e.g. a covariance penalty across teammates). build is
+        called with the optimizer once the cvxpy problem is built and returns the penalty expression and a
+        list of constraints on any auxiliary variables it introduces. Penalized problems are always solved
+        with cvxpy.
+        """
+        if self.backend == "exact":
+            raise ValueError("The exact roster backend only supports position and total player counts")
+        self.penalties.append(build)
+        self.problem = None
+
+    def select(self, matrix):
+        """
+        Given a (sparse) matrix whose columns follow the store, the cvxpy expression of the matrix times the
+        roster selection. Constraint builders use it to write team or usage constraints as one vectorized
+        expression.
+        """
+        from scipy import sparse
+
+        return sparse.csc_array(matrix)[:, self.candidates] @ self.variable
+
+    def update(self, value:np.ndarray=None, available:np.ndarray=None):
+        """
+        Given per-player values and/or availability (rows follow the store), update the problem.
+        """
+        if value is not None:
+            self.value = np.array(value,dtype=float)
+            self._value_changed = True
+        if available is not None:
+            self.availability = np.array(available,dtype=bool)
+            self._availability_changed = True
+
+    def mark_drafted(self, rows):
+        """
+        Given the row (or rows) of drafted players, remove them from the roster problem. Only the
+        availability mask changes here; cvxpy parameters are refreshed on the next solve.
+        """
+        self.availability[rows] = False
+        self._availability_changed = True
+
+    def mark_available(self, rows):
+        """
+        Given the row (or rows) of players, return them to the roster problem (e.g. to undo a pick).
+        """
+        self.availability[rows] = True
+        self._availability_changed = True
+
+    def mark_kept(self, rows):
+        """
+        Given the row (or rows) of players we drafted, keep them on the roster; the rest of the roster is
+        optimized around them.
+        """
+        self.kept[rows] = True
+        self.availability[rows] = False
+        self._availability_changed = True
+
+    def residual(self):
+        """
+        Position caps and total players left after the kept players.
+        """
+        counts = [np.count_nonzero(self.kept[rows]) for rows in self.rows.values()]
+        return residual_caps(self.caps, counts, self.total_players)
+
+    def uses_cvxpy(self):
+        """
+        Whether solve runs the cvxpy MILP rather than the exact cardinality solver.
+        """
+        return self.backend == "cvxpy" or (self.backend == "auto" and len(self.extra_constraints + self.penalties) > 0)
+
+    def solve(self, **kwargs):
+        """
+        Solve the roster problem. The cvxpy backend warm starts from the previous solution where the
+        solver supports it.
+
+        Parameters
+        ----------
+        **kwargs
+            Passed through to cvxpy's Problem.solve
+
+        Returns
+        -------
+        roster: np.ndarray
+            Mask of the players on the optimal roster (rows follow the store)
+        """
+        if not self.uses_cvxpy():
+            with INSTRUMENTATION.stage("solve_cardinality_roster", players=len(self.position)):
+                caps, total_players = self.residual()
+                roster, objective = solve_cardinality_roster(self.value, self.position, self.availability,
+                                                             caps, total_players)
+            self.objective = objective + float(self.value[self.kept].sum())
+            return roster | self.kept
+
+        import cvxpy as cp
+
+        if self.problem is None:
+            with INSTRUMENTATION.stage("build_problem", players=len(self.position)):
+                self._build_problem()
+        rows = self.candidates
+        if self._value_changed:
+            self.values.value = self.value[rows]
+        if self._availability_changed:
+            self.available.value = (self.availability[rows] | self.kept[rows]).astype(float)
+            self.keep.value = self.kept[rows].astype(float)
+        self._value_changed = self._availability_changed = False
+
+        # The relaxation needs a simplex solver to stop on a vertex (interior point solvers stop between tied ones)
+        problem, variable = self.problem, self.variable
+        with INSTRUMENTATION.stage("problem.solve", players=len(self.position)):
+            if self.relaxed and cp.HIGHS in cp.installed_solvers():
+                problem.solve(warm_start=True, **{"solver": cp.HIGHS, **kwargs})
+            else:
+                problem.solve(warm_start=True, **kwargs)
+        INSTRUMENTATION.solver(problem)
+        if problem.status not in (cp.OPTIMAL, cp.OPTIMAL_INACCURATE):
+            raise ValueError("Roster problem is " + str(problem.status))
+        if self.relaxed and np.abs(variable.value - np.round(variable.value)).max() > 1e-6:
+            # Optimum off a vertex: solve this re-solve as a MILP (with any MILP solver, the requested one may
+            # only handle LPs), keeping the relaxation for the next one
+            kwargs.pop("solver", None)
+            if self.milp is None:
+                milp_variable = cp.Variable(len(self.candidates),boolean=True)
+                obj, constraints = self._cap_terms(milp_variable)
+                self.milp = cp.Problem(objective=cp.Maximize(obj), constraints=constraints), milp_variable
+            problem, variable = self.milp
+            with INSTRUMENTATION.stage("problem.solve", players=len(self.position), milp=True):
+                problem.solve(warm_start=True, **kwargs)
+            INSTRUMENTATION.solver(problem)
+            if problem.status not in (cp.OPTIMAL, cp.OPTIMAL_INACCURATE):
+                raise ValueError("Roster problem is " + str(problem.status))
+        self.objective = float(self.value[self.candidates] @ np.round(variable.value)) \
+            if problem is self.problem and self.relaxed else float(problem.value)
+
+        roster = np.zeros(len(self.position),dtype=bool)
+        roster[self.candidates] = variable.value > 0.5
+        return roster
+
+    def _drop_bounds(self, roster:np.ndarray, rows:np.ndarray, replacements:int=10):
+        """
+        Given the optimal roster of the cvxpy problem (without penalties), bound the roster value lost without
+        each of the given roster players by the value given up swapping them for the best available player of
+        the same position that keeps every constraint satisfied.
+
+        Parameters
+        ----------
+        roster: np.ndarray
+            Mask of the players on the optimal roster (rows follow the store)
+        rows: np.ndarray
+            Rows of the roster players to bound
+        replacements: int
+            Most valuable replacements tried per player
+
+        Returns
+        -------
+        bound: np.ndarray
+            Upper bound of the drop of each player (inf when none of the replacements is feasible)
+        """
+        selection = roster[self.candidates].astype(float)
+        bound = np.full(len(rows), np.inf)
+        for _j, row in enumerate(rows):
+            same = self.rows[POSITIONS[self.position[row]]]
+            same = same[self.availability[same] & ~roster[same]]
+            for replacement in same[np.argsort(-self.value[same], kind="stable")][:replacements]:
+                swap = selection.copy()
+                swap[np.searchsorted(self.candidates, [row, replacement])] = [0., 1.]
+                self.variable.value = swap
+                if all(np.all(constraint.violation() <= 1e-6) for constraint in self.problem.constraints):
+                    bound[_j] = self.value[row] - self.value[replacement]
+                    break
+        self.variable.value = selection
+        return bound
+
+    def recommend(self, top:int=10, **kwargs):
+        """
+        Rank the available players by how much the optimal roster value drops if they are taken by
+        someone else. The exact backend computes every drop from sorted prefix sums. The cvxpy backend
+        re-solves without players on the optimal roster (every other player's drop is zero): without penalties
+        each drop is first bounded by the best feasible same-position swap (see _drop_bounds) and players are
+        re-solved best bound first until no bound left can reach the top, so about top re-solves are needed;
+        with penalties every player on the roster is re-solved (about 0.1-0.2 s each at 600 players).
+
+        Parameters
+        ----------
+        top: int
+            Number of players to recommend
+        **kwargs
+            Passed through to cvxpy's Problem.solve
+
+        Returns
+        -------
+        rows: np.ndarray
+            Rows of the recommended players, best first (ties broken by projected value)
+        drop: np.ndarray
+            Optimal roster value lost without each recommended player
+        """
+        if not self.uses_cvxpy():
+            caps, total_players = self.residual()
+            drop = roster_value_drop(self.value, self.position, self.availability, caps, total_players)
+        else:
+            roster = self.solve(**kwargs)
+            optimum = self.objective
+            drop = np.zeros(len(self.position))
+            rostered = np.flatnonzero(roster & ~self.kept)
+            bound = np.full(len(rostered), np.inf) if self.penalties else self._drop_bounds(roster, rostered)
+
+            # Re-solve best bound first; players left unsolved are bounded below the top drops and keep 0
+            solved = []
+            for _j in np.argsort(-bound, kind="stable"):
+                if len(solved) >= top and (not solved or bound[_j] < sorted(solved)[-top]):
+                    break
+                _i = rostered[_j]
+                self.mark_drafted(_i)
+                try:
+                    self.solve(**kwargs)
+                    drop[_i] = optimum - self.objective
+                except ValueError:
+                    drop[_i] = np.inf
+                self.mark_available(_i)
+                solved.append(drop[_i])
+            if INSTRUMENTATION.enabled:
+                INSTRUMENTATION.count("recommend_resolves", len(solved))
+            self.objective = optimum
+
+        rows = np.flatnonzero(self.availability)
+        rows = rows[np.lexsort((-self.value[rows], -drop[rows]))][:top]
+        return rows, drop[rows]
+
+def team_limit(team:np.ndarray, max_players:int):
+    """
+    Anti-stacking constraint builder (see RosterOptimizer.add_constraint): at most max_players from any
+    one team.
+
+    Parameters
+    ----------
+    team: np.ndarray
+        Team abbreviation of each player
+    max_players: int
+        Maximum players on the roster from a single team
+    """
+    teams, membership = team_membership(team)
+
+    def build(optimizer):
+        return [optimizer.select(membership) <= max_players]
+    return build
+
+def quarterback_stack(team:np.ndarray, position:np.ndarray, receivers:int=1):
+    """
+    Stacking constraint builder (see RosterOptimizer.add_constraint): every quarterback on the roster comes
+    with at least the given number of wide receivers or tight ends from the same team.
+
+    Parameters
+    ----------
+    team: np.ndarray
+        Team abbreviation of each player
+    position: np.ndarray
+        Position code of each player
+    receivers: int
+        Pass catchers from the same team required per quarterback
+    """
+    from scipy import sparse
+
+    teams, membership = team_membership(team)
+    quarterbacks = membership @ sparse.diags_array((position == POSITION_CODES["QB"]).astype(float))
+    pass_catchers = membership @ sparse.diags_array(np.isin(position, [POSITION_CODES["WR"],
+                                                                       POSITION_CODES["TE"]]).astype(float))
+
+    def build(optimizer):
+        return [optimizer.select(pass_catchers) >= receivers * optimizer.select(quarterbacks)]
+    return build
+
+def usage_limit(team:np.ndarray, share:np.ndarray, max_share:dict):
+    """
+    Usage constraint builder (see RosterOptimizer.add_constraint): the combined usage share drafted from any
+    one team is capped, since teammates take targets and carries from each other.
+
+    Parameters
+    ----------
+    team: np.ndarray
+        Team abbreviation of each player
+    share: np.ndarray
+        Player x usage stat shares of the player's team (see PlayerStore.usage_share)
+    max_share: dict
+        Usage stat (from USAGE_STATS) -> maximum combined share from a single team
+    """
+    from scipy import sparse
+
+    teams, membership = team_membership(team)
+    usage = {
+        stat: membership @ sparse.diags_array(share[:, USAGE_STATS.index(stat)])
+        for stat in max_share
+    }
+
+    def build(optimizer):
+        return [optimizer.select(usage[stat]) <= limit for stat, limit in max_share.items()]
+    return build
+
+def teammate_penalty(team:np.ndarray, spread:np.ndarray, weight:float, breakpoints:int=32,
+                     max_players:int=TOTAL_PLAYERS, quadratic:bool=False):
+    """
+    Covariance penalty builder (see RosterOptimizer.add_penalty). Teammates' outcomes are treated as
+    perfectly correlated, so the penalty is weight times the roster value covariance across teammates,
+    sum over teams of (e_t^2 - sum of the squared spreads on team t), where e_t is the summed value spread
+    of the team's rostered players. e_t^2 is bounded below by tangent cuts at evenly spaced breakpoints,
+    keeping the problem a MILP whose size grows linearly with the players (each cut underestimates e_t^2
+    by at most a quarter of the squared breakpoint spacing); quadratic keeps the exact square, which
+    needs a mixed-integer quadratic solver.
+
+    Parameters
+    ----------
+    team: np.ndarray
+        Team abbreviation of each player
+    spread: np.ndarray
+        Standard deviation of each player's fantasy value
+    weight: float
+        Roster value given up per unit of teammate covariance (risk aversion times the teammate correlation)
+    breakpoints: int
+        Tangent cuts per team
+    max_players: int
+        Most players a roster takes from one team (bounds the exposure the breakpoints span)
+    quadratic: bool
+        Penalize the exact squared exposures instead of their tangent cuts
+    """
+    from scipy import sparse
+
+    teams, membership = team_membership(team)
+    exposure_matrix = membership @ sparse.diags_array(spread)
+    own_variance = (membership.sum(axis=0) * spread**2)[None, :]
+
+    # Largest exposure of each team: the summed spread of its max_players most uncertain players
+    member = membership.tocoo()
+    order = np.lexsort((-spread[member.col], member.row))
+    code = member.row[order]
+    top = (np.arange(len(order)) - np.searchsorted(code, code)) < max_players
+    max_exposure = np.bincount(code[top], spread[member.col[order][top]], minlength=len(teams))
+    points = max_exposure[:, None] * np.linspace(0., 1., breakpoints)[None, :]
+
+    def build(optimizer):
+        import cvxpy as cp
+
+        exposure = optimizer.select(exposure_matrix)
+        covariance = -cp.sum(optimizer.select(own_variance))
+        if quadratic:
+            return weight * (cp.sum_squares(exposure) + covariance), []
+        square = cp.Variable(len(teams))
+        cuts = square[:, None] >= cp.multiply(2 * points, exposure[:, None]) - points**2
+        return weight * (cp.sum(square) + covariance), [cuts]
+    return build
+
+class DraftLog:
+    """
+    Drafted players csv (one "name,team" pick per line) that is read incrementally as picks are appended.
+
+    Parameters
+    ----------
+    csv: str
+        Address of the drafted players csv
+    """
+    def __init__(self, csv:str):
+        self.csv = csv
+        self.offset = 0
+
+    def poll(self, final:bool=False):
+        """
+        Read the picks appended since the last poll. Incomplete trailing lines are left for the next poll
+        (unless final) and a truncated file is read again from the start.
+
+        Parameters
+        ----------
+        final: bool
+            Also consume a last line without a trailing newline (for one-shot reads of a finished file)
+
+        Returns
+        -------
+        picks: list
+            (name, team) of each new pick, team is None when the line has no team
+        """
+        try:
+            if os.path.getsize(self.csv) < self.offset:
+                self.offset = 0
+            with open(self.csv, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        # Only consume complete lines while the file may still be written
+        end = len(data) if final else data.rfind(b"\n") + 1
+        self.offset += end
+        picks = []
+        for row in csv_module.reader(data[:end].decode().splitlines()):
+            if row and row[0].strip():
+                picks.append((row[0].strip(), row[1].strip() if len(row) > 1 else None))
+        return picks
+
+    async def watch(self, interval:float=0.5):
+        """
+        Yield batches of new picks as they are appended to the csv, polling every interval seconds without
+        blocking the event loop.
+        """
+        import asyncio
+
+        while True:
+            picks = self.poll()
+            if picks:
+                yield picks
+            else:
+                await asyncio.sleep(interval)
+
+@dataclass
+class SimulationResult:
+    pick_frequency: np.ndarray      # Fraction of scenarios in which each player is on the optimal roster
+    roster_value: np.ndarray        # Optimal roster value of each scenario
+    player_value_mean: np.ndarray   # Mean simulated fantasy value of each player
+    player_value_std: np.ndarray    # Standard deviation of each player's simulated fantasy value
+
+def projection_spread(store:PlayerStore):
+    """
+    Season-to-season standard deviation of each player's stats. Players with fewer than two seasons use
+    the average spread of their position.
+    """
+    std = store.std()
+    position_std = np.zeros((len(POSITIONS)+1, len(STATS)))
+    for _k in range(len(POSITIONS)):
+        rows = (store.position == _k) & ~np.isnan(std[:, 0])
+        if rows.any():
+            position_std[_k] = std[rows].mean(axis=0)
+    return np.where(np.isnan(std), position_std[store.position], std)
+
+def sample_stats(mean:np.ndarray, std:np.ndarray, scenarios:int, rng:np.random.Generator):
+    """
+    Draw scenarios x player x stat samples around the projected stats (normal, clipped at zero).
+    """
+    samples = rng.standard_normal((scenarios,) + mean.shape)
+    samples *= std
+    samples += mean
+    return np.maximum(samples, 0., out=samples)
+
+def _simulate_chunk(mean, std, weights, position, available, caps, total_players, scenarios, seed):
+    """
+    Sample, score and solve one chunk of scenarios (process pool worker).
+    """
+    values = sample_stats(mean, std, scenarios, np.random.default_rng(seed)) @ weights
+    picks = np.zeros(len(mean))
+    roster_value = np.zeros(scenarios)
+    for _n in range(scenarios):
+        roster, roster_value[_n] = solve_cardinality_roster(values[_n], position, available, caps, total_players)
+        picks += roster
+    return picks, roster_value, values.sum(axis=0), (values**2).sum(axis=0)
+
+def simulate_rosters(store:PlayerStore, scenarios:int, profile:ScoringProfile=LEAGUE_SCORING,
+                     available:np.ndarray=None, caps:dict=ROSTER_CAPS, total_players:int=TOTAL_PLAYERS,
+                     workers:int=None, chunk_size:int=250, seed:int=None, projection:np.ndarray=None):
+    """
+    Given a player store, draw stat scenarios around each player's projection from their season-to-season
+    variance, score them and solve the optimal roster of every scenario across a process pool.
+
+    Parameters
+    ----------
+    store: PlayerStore
+        Player statistics to project from
+    scenarios: int
+        Number of scenarios to simulate
+    profile: ScoringProfile
+        Scoring profile of the league
+    available: np.ndarray
+        Mask of players that can be drafted (all players by default)
+    caps: dict
+        Position -> (minimum, maximum) players on the roster
+    total_players: int
+        Total players on the roster
+    workers: int
+        Worker processes (defaults to the number of CPUs)
+    chunk_size: int
+        Scenarios sampled and solved per task
+    seed: int
+        Seed of the random scenarios
+    projection: np.ndarray
+        Player x stat projections the scenarios are centered on (see merge_player_stats; None for the
+        plain mean over the seasons played)
+
+    Returns
+    -------
+    result: SimulationResult
+        Pick frequencies and value distributions over the scenarios
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    mean = store.mean() if projection is None else projection
+    std = projection_spread(store)
+    weights = scoring_weights(profile)
+    sizes = [min(chunk_size, scenarios - start) for start in range(0, scenarios, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunks = list(pool.map(_simulate_chunk, *zip(*[
+            (mean, std, weights, store.position, available, caps, total_players, size, chunk_seed)
+            for size, chunk_seed in zip(sizes, seeds)
+        ])))
+
+    picks, roster_value, value_sum, value_sq = zip(*chunks)
+    value_mean = sum(value_sum) / scenarios
+    return SimulationResult(
+        pick_frequency=sum(picks) / scenarios,
+        roster_value=np.concatenate(roster_value),
+        player_value_mean=value_mean,
+        player_value_std=np.sqrt(np.maximum(sum(value_sq) / scenarios - value_mean**2, 0.))
+    )
 
-        # Player rushing yards
-        rush_yds_temp = df.iloc[:,13].tolist()
-        rush_yds_temp = [float(yds) for yds in rush_yds_temp]
+@dataclass
+class DraftSimulationResult:
+    slot_value_mean: np.ndarray     # Mean projected value of our final roster from each draft slot
+    slot_value_std: np.ndarray      # Standard deviation of our final roster value from each draft slot
+    roster_value: np.ndarray        # Draft slot x draft final roster value
 
-        # Player rushing TDs
-        rush_tds_temp = df.iloc[:,15].tolist()
-        rush_tds_temp = [float(tds) for tds in rush_tds_temp]
+# Shared (read-only) inputs of the draft simulation worker processes
+_DRAFT_CONTEXT = dict()
 
-        # Player receiving yards
-        rec_yds_temp = df.iloc[:,18].tolist()
-        rec_yds_temp = [float(yds) for yds in rec_yds_temp]
+def _init_draft_worker(context:dict):
+    """
+    Store the draft simulation inputs once per worker process.
+    """
+    _DRAFT_CONTEXT.update(context)
 
-        # Player receptions
-        rec_tot_temp = df.iloc[:,17].tolist()
-        rec_tot_temp = [float(rec) for rec in rec_tot_temp]
+def _optimizer_pick(value, position, available, counts, caps, total_players):
+    """
+    Pick the player whose loss would cost the best completion of the roster the most. Candidates are the
+    players of that completion, so tied drops (e.g. kickers of equal value) never fall through to a position
+    that is already full.
+    """
+    caps, total_players = residual_caps(caps, counts, total_players)
+    drop = roster_value_drop(value, position, available, caps, total_players)
+    rows = np.flatnonzero(solve_cardinality_roster(value, position, available, caps, total_players)[0])
+    return rows[np.lexsort((-value[rows], -drop[rows]))[0]]
 
-        # Player receiving TDs
-        rec_tds_temp = df.iloc[:,20].tolist()
-        rec_tds_temp = [float(tds) for tds in rec_tds_temp]
+def _ranked_pick(order, position_slot, available, counts, min_counts, max_counts, total_players):
+    """
+    Pick the first available player in the ranking whose position still fits the roster caps.
+    """
+    picks_left = total_players - counts.sum() - 1
+    short = np.maximum(min_counts - counts, 0)
+    allowed = (counts < max_counts) & (short.sum() - (short > 0) <= picks_left)
+    allowed = np.append(allowed, False)
+    candidates = order[available[order] & allowed[position_slot[order]]]
+    return candidates[0]
+
+def _simulate_draft_chunk(slot:int, drafts:int, seed):
+    """
+    Run several snake drafts picking from the given slot (process pool worker).
+    """
+    value, position, adp = _DRAFT_CONTEXT["value"], _DRAFT_CONTEXT["position"], _DRAFT_CONTEXT["adp"]
+    caps, total_players = _DRAFT_CONTEXT["caps"], _DRAFT_CONTEXT["total_players"]
+    teams, policy, adp_noise = _DRAFT_CONTEXT["teams"], _DRAFT_CONTEXT["policy"], _DRAFT_CONTEXT["adp_noise"]
+    rng = np.random.default_rng(seed)
+
+    # Roster cap slot of each player (players at positions without caps are never drafted)
+    cap_slot = np.full(len(POSITIONS)+1, len(caps))
+    for _k, pos in enumerate(caps):
+        cap_slot[POSITION_CODES[pos]] = _k
+    position_slot = cap_slot[position]
+    min_counts = np.array([min_count for min_count, max_count in caps.values()])
+    max_counts = np.array([max_count for min_count, max_count in caps.values()])
+    value_order = np.argsort(-value, kind="stable")
+
+    roster_value = np.zeros(drafts)
+    for _d in range(drafts):
+        # Byte-per-player availability shared by every team in this draft
+        available = np.ones(len(value),dtype=bool)
+        available[position_slot == len(caps)] = False
+        counts = np.zeros((teams, len(caps)),dtype=int)
+        order = np.argsort(adp * rng.lognormal(0., adp_noise, len(adp))) if policy == "adp" else value_order
+
+        for _r in range(total_players):
+            for team in (range(teams) if _r % 2 == 0 else range(teams-1, -1, -1)):
+                if team == slot or policy == "optimizer":
+                    row = _optimizer_pick(value, position, available, counts[team], caps, total_players)
+                else:
+                    row = _ranked_pick(order, position_slot, available, counts[team], min_counts, max_counts,
+                                       total_players)
+                available[row] = False
+                counts[team, position_slot[row]] += 1
+                if team == slot:
+                    roster_value[_d] += value[row]
+    return roster_value
+
+def simulate_drafts(value:np.ndarray, position:np.ndarray, teams:int=12, drafts:int=1000, policy:str="adp",
+                    adp:np.ndarray=None, adp_noise:float=0.2, caps:dict=ROSTER_CAPS,
+                    total_players:int=TOTAL_PLAYERS, workers:int=None, chunk_size:int=50, seed:int=None):
+    """
+    Simulate full snake drafts of a league from every draft slot. We pick with the roster optimizer (the
+    player whose loss would cost our best roster completion the most) and every opponent picks with the
+    given policy, all within the position caps.
+
+    Parameters
+    ----------
+    value: np.ndarray
+        Projected fantasy value of each player
+    position: np.ndarray
+        Position code of each player
+    teams: int
+        Teams in the league
+    drafts: int
+        Drafts to simulate from each draft slot
+    policy: str
+        Opponent policy: "adp" (average draft position with noise), "greedy" (best available value) or
+        "optimizer" (same as ours)
+    adp: np.ndarray
+        Average draft position of each player (defaults to the projected value rank)
+    adp_noise: float
+        Log-normal noise on the average draft positions of each draft
+    caps: dict
+        Position -> (minimum, maximum) players on the roster
+    total_players: int
+        Total players on each roster
+    workers: int
+        Worker processes (defaults to the number of CPUs)
+    chunk_size: int
+        Drafts simulated per task
+    seed: int
+        Seed of the random draft orders
 
-        # Player fumbles (unrecovered)
-        fum_temp = df.iloc[:,22].tolist()
-        fum_temp = [float(fum) for fum in fum_temp]
+    Returns
+    -------
+    result: DraftSimulationResult
+        Distribution of our final roster value from each draft slot
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if policy not in ("adp", "greedy", "optimizer"):
+        raise ValueError("Unknown draft policy: " + str(policy))
+    value = np.asarray(value,dtype=float)
+    if adp is None:
+        adp = np.empty(len(value))
+        adp[np.argsort(-value, kind="stable")] = np.arange(1, len(value)+1)
+    context = {
+        "value": value, "position": position, "adp": np.asarray(adp,dtype=float), "caps": caps,
+        "total_players": total_players, "teams": teams, "policy": policy, "adp_noise": adp_noise
+    }
+
+    # One task per draft slot and chunk of drafts
+    tasks = [(slot, min(chunk_size, drafts - start)) for slot in range(teams) for start in range(0, drafts, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_draft_worker, initargs=(context,)) as pool:
+        chunks = list(pool.map(_simulate_draft_chunk, *zip(*[task + (task_seed,) for task, task_seed in zip(tasks, seeds)])))
+
+    roster_value = np.zeros((teams, drafts))
+    filled = np.zeros(teams,dtype=int)
+    for (slot, size), chunk in zip(tasks, chunks):
+        roster_value[slot, filled[slot]:filled[slot]+size] = chunk
+        filled[slot] += size
+    return DraftSimulationResult(
+        slot_value_mean=roster_value.mean(axis=1),
+        slot_value_std=roster_value.std(axis=1),
+        roster_value=roster_value
+    )
 
-        # Add data to existing players (don't care about players who didn't play last year)
-        for _j in range(len(name_temp)):
+class DraftRoom:
+    """
+    Draft-night state kept in memory: the player store, projected values and the roster optimizer, updated
+    as picks arrive.
+
+    Parameters
+    ----------
+    store: PlayerStore
+        Player statistics of the draft pool
+    value: np.ndarray
+        Projected fantasy value of each player
+    our_team: str
+        Team name of our picks (kept on our roster, every other pick is removed from the pool)
+    recommendations: int
+        Next picks to recommend
+    **kwargs
+        Passed through to RosterOptimizer
+    """
+    def __init__(self, store:PlayerStore, value:np.ndarray, our_team:str=None, recommendations:int=10, **kwargs):
+        self.store = store
+        self.value = value
+        self.our_team = our_team
+        self.recommendations = recommendations
+        self.optimizer = RosterOptimizer(store.position, value, **kwargs)
+        self.picks = []
+        self.rows = []
+
+    def _player(self, row:int, **fields):
+        return {
+            "name": str(self.store.name[row]),
+            "position": POSITIONS[self.store.position[row]] if self.store.position[row] >= 0 else None,
+            "value": float(self.value[row]),
+            **fields
+        }
+
+    def pick(self, name:str, team:str=None, position:str=None, nfl_team:str=None):
+        """
+        Record a pick, keeping it on our roster if it is ours and removing it from the pool otherwise. The
+        position and NFL team tell namesakes apart (see PlayerStore.find).
+        """
+        row = self.store.find(name, position, nfl_team)
+        if row is None:
+            raise KeyError("Unknown player: " + str(name))
+        if not self.optimizer.availability[row]:
+            raise ValueError("Player already drafted: " + str(name))
+        if team is not None and team == self.our_team:
+            if row not in self.optimizer.candidates:
+                raise ValueError("Player's position is not on our roster: " + str(name))
+            self.optimizer.mark_kept(row)
             try:
-                # Check if player played in 2023
-                draft_indx = draftee_name.index(name_temp[_j])
-
-                # Add stats
-                draftee_pass_yds[draft_indx] += pass_yds_temp[_j]
-                draftee_pass_tds[draft_indx] += pass_tds_temp[_j]
-                draftee_pass_ints[draft_indx] += pass_ints_temp[_j]
-                draftee_rush_yds[draft_indx] += rush_yds_temp[_j]
-                draftee_rush_tds[draft_indx] += rush_tds_temp[_j]
-                draftee_rec_yds[draft_indx] += rec_yds_temp[_j]
-                draftee_rec_tot[draft_indx] += rec_tot_temp[_j]
-                draftee_rec_tds[draft_indx] += rec_tds_temp[_j]
-                draftee_fum[draft_indx] += fum_temp[_j]
-
-                # Record season played
-                draftee_seasons[draft_indx] += 1
-            except:
-                continue
+                self.optimizer.residual()
+            except ValueError:
+                self._release(row)
+                raise ValueError("Pick exceeds our roster caps: " + str(name))
+        else:
+            self.optimizer.mark_drafted(row)
+        self.picks.append({"name": str(self.store.name[row]), "team": team})
+        self.rows.append(row)
+
+    def _release(self, row:int):
+        self.optimizer.kept[row] = False
+        self.optimizer.mark_available(row)
+
+    def undo(self):
+        """
+        Take back the last pick, returning the player to the pool.
+        """
+        if not self.picks:
+            raise ValueError("No picks to undo")
+        self.picks.pop()
+        self._release(self.rows.pop())
+
+    def state(self):
+        """
+        Solve the roster and recommend the next picks.
+
+        Returns
+        -------
+        state: dict
+            Picks so far, optimal roster and next-pick recommendations (JSON serializable)
+        """
+        roster = self.optimizer.solve()
+        rows, drop = self.optimizer.recommend(self.recommendations)
+        return {
+            "picks": list(self.picks),
+            "roster_value": self.optimizer.objective,
+            "roster": [self._player(_i, kept=bool(self.optimizer.kept[_i])) for _i in np.flatnonzero(roster)],
+            "recommendations": [
+                self._player(_i, value_over_replacement=float(_drop) if np.isfinite(_drop) else None)
+                for _i, _drop in zip(rows, drop)
+            ]
+        }
+
+class DraftServer:
+    """
+    Local HTTP server around a draft room. Solves run in an executor so the event loop never blocks.
+
+    Endpoints
+    ---------
+    GET /state
+        Current picks, optimal roster and recommendations
+    POST /pick
+        JSON body {"name": ..., "team": ...} with optional "position" and "nfl_team" telling namesakes apart;
+        records the pick and returns the updated state (a pick that leaves the roster problem infeasible is
+        taken back and answered with 409)
+    GET /events
+        Server-sent event stream pushing the state after every pick
+
+    Picks appended to a drafted players csv can be followed as well (see follow).
+    """
+    def __init__(self, room:DraftRoom):
+        import asyncio
+
+        self.room = room
+        self.lock = asyncio.Lock()
+        self.subscribers = set()
+        self.latest = None
+
+    async def _state(self):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        self.latest = await loop.run_in_executor(None, self.room.state)
+        return self.latest
+
+    async def _respond(self, writer, status:str, body):
+        data = json.dumps(body).encode()
+        writer.write(("HTTP/1.1 " + status + "\r\nContent-Type: application/json\r\nContent-Length: " +
+                      str(len(data)) + "\r\nConnection: close\r\n\r\n").encode() + data)
+        await writer.drain()
+
+    async def _events(self, writer):
+        import asyncio
+
+        # Initial state under the lock, since recommendations temporarily change the shared optimizer
+        async with self.lock:
+            state = self.latest if self.latest is not None else await self._state()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n\r\n")
+        queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        try:
+            await queue.put(state)
+            while True:
+                writer.write(b"data: " + json.dumps(await queue.get()).encode() + b"\n\n")
+                await writer.drain()
+        finally:
+            self.subscribers.discard(queue)
+
+    async def handle(self, reader, writer):
+        """
+        Handle one HTTP connection.
+        """
+        import asyncio
 
-    # Remove already drafted players
-    for _i in range(len(drafted_players)):
         try:
-            # Check if player played in 2023
-            draft_indx = draftee_name.index(str(drafted_players[_i]))
-
-            # Zero out all entries
-            draftee_pass_yds[draft_indx] = 0.
-            draftee_pass_tds[draft_indx] = 0.
-            draftee_pass_ints[draft_indx] = 0.
-            draftee_rush_yds[draft_indx] = 0.
-            draftee_rush_tds[draft_indx] = 0.
-            draftee_rec_yds[draft_indx] = 0.
-            draftee_rec_tot[draft_indx] = 0.
-            draftee_rec_tds[draft_indx] = 0.
-            draftee_fum[draft_indx] = 0.
-        except:
-            continue
-
-    # Get average stats
-    draftee_pass_yds_avg = [0.] * len(draftee_name)
-    draftee_pass_tds_avg = [0.] * len(draftee_name)
-    draftee_pass_ints_avg = [0.] * len(draftee_name)
-    draftee_rush_yds_avg = [0.] * len(draftee_name)
-    draftee_rush_tds_avg = [0.] * len(draftee_name)
-    draftee_rec_yds_avg = [0.] * len(draftee_name)
-    draftee_rec_tot_avg = [0.] * len(draftee_name)
-    draftee_rec_tds_avg = [0.] * len(draftee_name)
-    draftee_fum_avg = [0.] * len(draftee_name)
-    for _i in range(len(draftee_name)):
-        draftee_pass_yds_avg[_i] = draftee_pass_yds[_i] / draftee_seasons[_i]
-        draftee_pass_tds_avg[_i] = draftee_pass_tds[_i] / draftee_seasons[_i]
-        draftee_pass_ints_avg[_i] = draftee_pass_ints[_i] / draftee_seasons[_i]
-        draftee_rush_yds_avg[_i] = draftee_rush_yds[_i] / draftee_seasons[_i]
-        draftee_rush_tds_avg[_i] = draftee_rush_tds[_i] / draftee_seasons[_i]
-        draftee_rec_yds_avg[_i] = draftee_rec_yds[_i] / draftee_seasons[_i]
-        draftee_rec_tot_avg[_i] = draftee_rec_tot[_i] / draftee_seasons[_i]
-        draftee_rec_tds_avg[_i] = draftee_rec_tds[_i] / draftee_seasons[_i]
-        draftee_fum_avg[_i] = draftee_fum[_i] / draftee_seasons[_i]
-
-    # Split players into position arrays
-    # QBs
-    qb_name = np.zeros(0)
-    qb_pass_yds_avg = np.zeros(0)
-    qb_pass_tds_avg = np.zeros(0)
-    qb_pass_ints_avg = np.zeros(0)
-    qb_rush_yds_avg = np.zeros(0)
-    qb_rush_tds_avg = np.zeros(0)
-    qb_rec_yds_avg = np.zeros(0)
-    qb_rec_tot_avg = np.zeros(0)
-    qb_rec_tds_avg = np.zeros(0)
-    qb_fum_avg = np.zeros(0)
-    for _i in range(len(draftee_position)):
-        if draftee_position[_i] == "QB":
-            qb_name = np.append(qb_name,draftee_name[_i])
-            qb_pass_yds_avg = np.append(qb_pass_yds_avg,draftee_pass_yds_avg[_i])
-            qb_pass_tds_avg = np.append(qb_pass_tds_avg,draftee_pass_tds_avg[_i])
-            qb_pass_ints_avg = np.append(qb_pass_ints_avg,draftee_pass_ints_avg[_i])
-            qb_rush_yds_avg = np.append(qb_rush_yds_avg,draftee_rush_yds_avg[_i])
-            qb_rush_tds_avg = np.append(qb_rush_tds_avg,draftee_rush_tds_avg[_i])
-            qb_rec_yds_avg = np.append(qb_rec_yds_avg,draftee_rec_yds_avg[_i])
-            qb_rec_tot_avg = np.append(qb_rec_tot_avg,draftee_rec_tot_avg[_i])
-            qb_rec_tds_avg = np.append(qb_rec_tds_avg,draftee_rec_tds_avg[_i])
-            qb_fum_avg = np.append(qb_fum_avg,draftee_fum_avg[_i])
-
-    # RBs
-    rb_name = np.zeros(0)
-    rb_pass_yds_avg = np.zeros(0)
-    rb_pass_tds_avg = np.zeros(0)
-    rb_pass_ints_avg = np.zeros(0)
-    rb_rush_yds_avg = np.zeros(0)
-    rb_rush_tds_avg = np.zeros(0)
-    rb_rec_yds_avg = np.zeros(0)
-    rb_rec_tot_avg = np.zeros(0)
-    rb_rec_tds_avg = np.zeros(0)
-    rb_fum_avg = np.zeros(0)
-    for _i in range(len(draftee_position)):
-        if draftee_position[_i] == "RB":
-            rb_name = np.append(rb_name,draftee_name[_i])
-            rb_pass_yds_avg = np.append(rb_pass_yds_avg,draftee_pass_yds_avg[_i])
-            rb_pass_tds_avg = np.append(rb_pass_tds_avg,draftee_pass_tds_avg[_i])
-            rb_pass_ints_avg = np.append(rb_pass_ints_avg,draftee_pass_ints_avg[_i])
-            rb_rush_yds_avg = np.append(rb_rush_yds_avg,draftee_rush_yds_avg[_i])
-            rb_rush_tds_avg = np.append(rb_rush_tds_avg,draftee_rush_tds_avg[_i])
-            rb_rec_yds_avg = np.append(rb_rec_yds_avg,draftee_rec_yds_avg[_i])
-            rb_rec_tot_avg = np.append(rb_rec_tot_avg,draftee_rec_tot_avg[_i])
-            rb_rec_tds_avg = np.append(rb_rec_tds_avg,draftee_rec_tds_avg[_i])
-            rb_fum_avg = np.append(rb_fum_avg,draftee_fum_avg[_i])
-
-    # WRs
-    wr_name = np.zeros(0)
-    wr_pass_yds_avg = np.zeros(0)
-    wr_pass_tds_avg = np.zeros(0)
-    wr_pass_ints_avg = np.zeros(0)
-    wr_rush_yds_avg = np.zeros(0)
-    wr_rush_tds_avg = np.zeros(0)
-    wr_rec_yds_avg = np.zeros(0)
-    wr_rec_tot_avg = np.zeros(0)
-    wr_rec_tds_avg = np.zeros(0)
-    wr_fum_avg = np.zeros(0)
-    for _i in range(len(draftee_position)):
-        if draftee_position[_i] == "WR":
-            wr_name = np.append(wr_name,draftee_name[_i])
-            wr_pass_yds_avg = np.append(wr_pass_yds_avg,draftee_pass_yds_avg[_i])
-            wr_pass_tds_avg = np.append(wr_pass_tds_avg,draftee_pass_tds_avg[_i])
-            wr_pass_ints_avg = np.append(wr_pass_ints_avg,draftee_pass_ints_avg[_i])
-            wr_rush_yds_avg = np.append(wr_rush_yds_avg,draftee_rush_yds_avg[_i])
-            wr_rush_tds_avg = np.append(wr_rush_tds_avg,draftee_rush_tds_avg[_i])
-            wr_rec_yds_avg = np.append(wr_rec_yds_avg,draftee_rec_yds_avg[_i])
-            wr_rec_tot_avg = np.append(wr_rec_tot_avg,draftee_rec_tot_avg[_i])
-            wr_rec_tds_avg = np.append(wr_rec_tds_avg,draftee_rec_tds_avg[_i])
-            wr_fum_avg = np.append(wr_fum_avg,draftee_fum_avg[_i])
-
-    # TEs
-    te_name = np.zeros(0)
-    te_pass_yds_avg = np.zeros(0)
-    te_pass_tds_avg = np.zeros(0)
-    te_pass_ints_avg = np.zeros(0)
-    te_rush_yds_avg = np.zeros(0)
-    te_rush_tds_avg = np.zeros(0)
-    te_rec_yds_avg = np.zeros(0)
-    te_rec_tot_avg = np.zeros(0)
-    te_rec_tds_avg = np.zeros(0)
-    te_fum_avg = np.zeros(0)
-    for _i in range(len(draftee_position)):
-        if draftee_position[_i] == "TE":
-            te_name = np.append(te_name,draftee_name[_i])
-            te_pass_yds_avg = np.append(te_pass_yds_avg,draftee_pass_yds_avg[_i])
-            te_pass_tds_avg = np.append(te_pass_tds_avg,draftee_pass_tds_avg[_i])
-            te_pass_ints_avg = np.append(te_pass_ints_avg,draftee_pass_ints_avg[_i])
-            te_rush_yds_avg = np.append(te_rush_yds_avg,draftee_rush_yds_avg[_i])
-            te_rush_tds_avg = np.append(te_rush_tds_avg,draftee_rush_tds_avg[_i])
-            te_rec_yds_avg = np.append(te_rec_yds_avg,draftee_rec_yds_avg[_i])
-            te_rec_tot_avg = np.append(te_rec_tot_avg,draftee_rec_tot_avg[_i])
-            te_rec_tds_avg = np.append(te_rec_tds_avg,draftee_rec_tds_avg[_i])
-            te_fum_avg = np.append(te_fum_avg,draftee_fum_avg[_i])
-
-    # Create convex variables for each position
-    qbs = cp.Variable(np.shape(qb_name)[0],boolean=True)
-    qb_count = cp.Variable()
-    rbs = cp.Variable(np.shape(rb_name)[0],boolean=True)
-    rb_count = cp.Variable()
-    wrs = cp.Variable(np.shape(wr_name)[0],boolean=True)
-    wr_count = cp.Variable()
-    tes = cp.Variable(np.shape(te_name)[0],boolean=True)
-    te_count = cp.Variable()
-
-    # Create objective (maximize TDs)
-    obj = qbs@(PASS_YD_POINTS*qb_pass_yds_avg + PASS_TD_POINTS*qb_pass_tds_avg + \
-            PASS_INT_POINTS*qb_pass_ints_avg + RUSH_YD_POINTS*qb_rush_yds_avg + \
-            RUSH_TD_POINTS*qb_rush_tds_avg + REC_YD_POINTS*qb_rec_yds_avg + \
-            REC_POINTS*qb_rec_tot_avg + REC_TD_POINTS*qb_rec_tds_avg + \
-            FUMBLE_POINTS*qb_fum_avg)
-    obj += rbs@(PASS_YD_POINTS*rb_pass_yds_avg + PASS_TD_POINTS*rb_pass_tds_avg + \
-            PASS_INT_POINTS*rb_pass_ints_avg + RUSH_YD_POINTS*rb_rush_yds_avg + \
-            RUSH_TD_POINTS*rb_rush_tds_avg + REC_YD_POINTS*rb_rec_yds_avg + \
-            REC_POINTS*rb_rec_tot_avg + REC_TD_POINTS*rb_rec_tds_avg + \
-            FUMBLE_POINTS*rb_fum_avg)
-    obj += wrs@(PASS_YD_POINTS*wr_pass_yds_avg + PASS_TD_POINTS*wr_pass_tds_avg + \
-            PASS_INT_POINTS*wr_pass_ints_avg + RUSH_YD_POINTS*wr_rush_yds_avg + \
-            RUSH_TD_POINTS*wr_rush_tds_avg + REC_YD_POINTS*wr_rec_yds_avg + \
-            REC_POINTS*wr_rec_tot_avg + REC_TD_POINTS*wr_rec_tds_avg + \
-            FUMBLE_POINTS*wr_fum_avg)
-    obj += tes@(PASS_YD_POINTS*te_pass_yds_avg + PASS_TD_POINTS*te_pass_tds_avg + \
-            PASS_INT_POINTS*te_pass_ints_avg + RUSH_YD_POINTS*te_rush_yds_avg + \
-            RUSH_TD_POINTS*te_rush_tds_avg + REC_YD_POINTS*te_rec_yds_avg + \
-            REC_POINTS*te_rec_tot_avg + REC_TD_POINTS*te_rec_tds_avg + \
-            FUMBLE_POINTS*te_fum_avg)
-    objective = cp.Maximize(obj)
-
-    # Constrain the convex problem
-    constraints = [
-        cp.sum(qbs) >= MIN_QB,
-        cp.sum(qbs) <= MAX_QB,
-        cp.sum(rbs) >= MIN_RB,
-        cp.sum(rbs) <= MAX_RB,
-        cp.sum(wrs) >= MIN_WR,
-        cp.sum(wrs) <= MAX_WR,
-        cp.sum(tes) >= MIN_TE,
-        cp.sum(tes) <= MAX_TE,
-        cp.sum(qbs) + cp.sum(rbs) + cp.sum(wrs) + cp.sum(tes) == TOTAL_PLAYERS
+            method, path, _ = (await reader.readline()).decode().split(" ", 2)
+            headers = dict()
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                key, _, header_value = line.partition(":")
+                headers[key.strip().lower()] = header_value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            if method == "GET" and path == "/state":
+                async with self.lock:
+                    try:
+                        state = await self._state()
+                    except ValueError as error:
+                        await self._respond(writer, "500 Internal Server Error", {"error": str(error)})
+                        return
+                await self._respond(writer, "200 OK", state)
+            elif method == "GET" and path == "/events":
+                try:
+                    await self._events(writer)
+                except ValueError as error:
+                    await self._respond(writer, "500 Internal Server Error", {"error": str(error)})
+            elif method == "POST" and path == "/pick":
+                try:
+                    event = json.loads(body or b"{}")
+                except ValueError:
+                    await self._respond(writer, "400 Bad Request", {"error": "Pick body is not valid JSON"})
+                    return
+                if not isinstance(event, dict) or not isinstance(event.get("name"), str):
+                    await self._respond(writer, "400 Bad Request", {"error": 'Pick body needs a "name"'})
+                    return
+                async with self.lock:
+                    try:
+                        self.room.pick(event["name"], event.get("team"), event.get("position"), event.get("nfl_team"))
+                    except (KeyError, ValueError) as error:
+                        await self._respond(writer, "400 Bad Request", {"error": str(error.args[0])})
+                        return
+                    try:
+                        state = await self._state()
+                    except ValueError as error:
+                        self.room.undo()
+                        await self._respond(writer, "409 Conflict", {"error": str(error)})
+                        return
+                for queue in self.subscribers:
+                    queue.put_nowait(state)
+                await self._respond(writer, "200 OK", state)
+            else:
+                await self._respond(writer, "404 Not Found", {"error": "Unknown endpoint " + method + " " + path})
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def follow(self, log:DraftLog, interval:float=0.5):
+        """
+        Record the picks appended to a drafted players csv and push the updated state to the event streams.
+        Picks the room rejects are skipped, and a batch leaving the roster problem infeasible is taken back.
+        """
+        async for picks in log.watch(interval):
+            async with self.lock:
+                applied = 0
+                for name, team in picks:
+                    try:
+                        self.room.pick(name, team)
+                        applied += 1
+                    except (KeyError, ValueError) as error:
+                        print("Skipped pick from " + log.csv + ": " + str(error.args[0]))
+                if not applied:
+                    continue
+                try:
+                    state = await self._state()
+                except ValueError as error:
+                    for _ in range(applied):
+                        self.room.undo()
+                    print("Took back picks from " + log.csv + ": " + str(error))
+                    continue
+            for queue in self.subscribers:
+                queue.put_nowait(state)
+
+    async def serve(self, host:str="127.0.0.1", port:int=8765, log:DraftLog=None):
+        """
+        Serve until cancelled, following the picks appended to the given drafted players csv (None to only
+        take picks over HTTP).
+        """
+        import asyncio
+
+        server = await asyncio.start_server(self.handle, host, port)
+        follower = asyncio.create_task(self.follow(log)) if log is not None else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if follower is not None:
+                follower.cancel()
+
+def season_years(stat_dir:str):
+    """
+    Years of the season csvs (named <year>.csv) in the given directory, oldest first.
+    """
+    return sorted(int(name[:-4]) for name in os.listdir(stat_dir) if name[:-4].isdigit() and name.endswith(".csv"))
+
+def _backtest_cell(stat_dir:str, season:int, window:int, profile:ScoringProfile, caps_name:str, caps:dict,
+                   total_players:int, projection:dict):
+    """
+    Project one season from the window of seasons before it, solve the roster and score it against the
+    season's actual results (process pool worker).
+    """
+    years = [year for year in range(season - window, season) if os.path.exists(os.path.join(stat_dir, str(year) + ".csv"))]
+    store = PlayerStore.from_csvs([os.path.join(stat_dir, str(year) + ".csv") for year in years], years)
+
+    # Projected roster exactly as the script builds it
+    caps, total_players, dropped = pool_caps(caps, store.position, total_players)
+    projected_value = fantasy_value(merge_player_stats(store, **projection), profile)
+    roster, projected_total = solve_cardinality_roster(projected_value, store.position, None, caps, total_players)
+
+    # Actual value of every candidate in the season, joined like the seasons of the store (players who did
+    # not play, or cannot be told apart from a namesake, score zero)
+    actual = read_season(os.path.join(stat_dir, str(season) + ".csv"))
+    rows = join_season(store.index, store.position, actual)
+    found = rows >= 0
+    actual_value = np.zeros(len(store.name))
+    actual_value[rows[found]] = fantasy_value(np.asarray(actual.stats)[found], profile)
+    best_roster, best_total = solve_cardinality_roster(actual_value, store.position, None, caps, total_players)
+
+    return {
+        "season": season,
+        "window": window,
+        "first_season_year": years[0],
+        "profile": profile.name,
+        "caps": caps_name,
+        "projected_value": projected_total,
+        "actual_value": float(actual_value[roster].sum()),
+        "best_actual_value": best_total,
+        "roster_played": int((actual_value[roster] != 0).sum()),
+        "best_overlap": int((roster & best_roster).sum())
+    }
+
+def backtest(stat_dir:str="Player_Statistics/", seasons:list=None, profiles:list=(LEAGUE_SCORING,),
+             windows:list=(4,), caps_grid:dict=None, total_players:int=TOTAL_PLAYERS, projection:dict=None,
+             workers:int=None):
+    """
+    Backtest the roster optimizer over historical seasons. Every (season, profile, window, caps) cell
+    projects the season from the seasons before it, solves the roster and scores it against the season's
+    actual results, with the cells spread over a process pool.
+
+    Parameters
+    ----------
+    stat_dir: str
+        Directory of the season csvs
+    seasons: list
+        Seasons to backtest (defaults to every season with an earlier season available)
+    profiles: list
+        Scoring profiles to sweep
+    windows: list
+        Projection windows to sweep (number of earlier seasons projected from)
+    caps_grid: dict
+        Name -> position caps to sweep (defaults to ROSTER_CAPS)
+    total_players: int
+        Total players on the roster
+    projection: dict
+        Keyword arguments of merge_player_stats
+    workers: int
+        Worker processes (defaults to the number of CPUs)
+
+    Returns
+    -------
+    results: pd.DataFrame
+        One row per cell with the projected, actual and best possible actual roster value
+    """
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+
+    years = season_years(stat_dir)
+    if seasons is None:
+        seasons = years[1:]
+    caps_grid = {"default": ROSTER_CAPS} if caps_grid is None else caps_grid
+    projection = dict() if projection is None else projection
+
+    # Parse every season once up front so the workers only read the cache
+    for year in years:
+        read_season(os.path.join(stat_dir, str(year) + ".csv"))
+
+    cells = [
+        (stat_dir, season, window, profile, caps_name, caps, total_players, projection)
+        for season in seasons if season - 1 in years
+        for profile in profiles
+        for window in windows
+        for caps_name, caps in caps_grid.items()
     ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_backtest_cell, *zip(*cells))) if cells else []
+    return pd.DataFrame(results)
 
-    # Create convex problem
-    problem = cp.Problem(
-        objective=objective,
-        constraints=constraints
-    )
+def _parse_caps(values:list):
+    """
+    Given position caps written as POS=MIN:MAX, override the matching ROSTER_CAPS entries.
+    """
+    caps = dict(ROSTER_CAPS)
+    for value in values or []:
+        pos, _, bounds = value.partition("=")
+        min_count, _, max_count = bounds.partition(":")
+        if pos not in POSITION_CODES or not min_count.isdigit() or not max_count.isdigit():
+            raise argparse.ArgumentTypeError("Position caps are written as POS=MIN:MAX, got " + value)
+        caps[pos] = (int(min_count), int(max_count))
+    return caps
+
+def _roster_caps(args, store:PlayerStore, quiet:bool=False):
+    """
+    Roster caps and total players of the selected options, without the positions missing from the pool.
+    """
+    caps, total_players, dropped = pool_caps(_parse_caps(args.caps), store.position, args.total_players)
+    if dropped and not quiet:
+        print("No " + ", ".join(dropped) + " players in the pool, leaving " + str(args.total_players - total_players) + \
+              " roster slots open")
+    return caps, total_players
 
-    # Solve problem
-    problem.solve()
-
-    # Print players with associated avg TDs
-    # QBs
-    total_QBs = int(np.linalg.norm(qbs.value,1))
-    print("\nNumber of QBs: " + str(total_QBs))
-    for _i in range(len(qbs.value)):
-        if qbs.value[_i]:
-            avg_fantasy_value = PASS_YD_POINTS*qb_pass_yds_avg[_i] + PASS_TD_POINTS*qb_pass_tds_avg[_i] + \
-                                PASS_INT_POINTS*qb_pass_ints_avg[_i] + RUSH_YD_POINTS*qb_rush_yds_avg[_i] + \
-                                RUSH_TD_POINTS*qb_rush_tds_avg[_i] + REC_YD_POINTS*qb_rec_yds_avg[_i] + \
-                                REC_POINTS*qb_rec_tot_avg[_i] + REC_TD_POINTS*qb_rec_tds_avg[_i] + \
-                                FUMBLE_POINTS*qb_fum_avg[_i]
-            print(" " + str(qb_name[_i]) + ":\n   -Value: " + str(avg_fantasy_value))
-
-    # RBs
-    total_RBs = int(np.linalg.norm(rbs.value,1))
-    print("\nNumber of RBs: " + str(total_RBs))
-    for _i in range(len(rbs.value)):
-        if rbs.value[_i]:
-            avg_fantasy_value = PASS_YD_POINTS*rb_pass_yds_avg[_i] + PASS_TD_POINTS*rb_pass_tds_avg[_i] + \
-                                PASS_INT_POINTS*rb_pass_ints_avg[_i] + RUSH_YD_POINTS*rb_rush_yds_avg[_i] + \
-                                RUSH_TD_POINTS*rb_rush_tds_avg[_i] + REC_YD_POINTS*rb_rec_yds_avg[_i] + \
-                                REC_POINTS*rb_rec_tot_avg[_i] + REC_TD_POINTS*rb_rec_tds_avg[_i] + \
-                                FUMBLE_POINTS*rb_fum_avg[_i]
-            print(" " + str(rb_name[_i]) + ":\n   -Value: " + str(avg_fantasy_value))
-
-    # WRs
-    total_WRs = int(np.linalg.norm(wrs.value,1))
-    print("\nNumber of WRs: " + str(total_WRs))
-    for _i in range(len(wrs.value)):
-        if wrs.value[_i]:
-            avg_fantasy_value = PASS_YD_POINTS*wr_pass_yds_avg[_i] + PASS_TD_POINTS*wr_pass_tds_avg[_i] + \
-                                PASS_INT_POINTS*wr_pass_ints_avg[_i] + RUSH_YD_POINTS*wr_rush_yds_avg[_i] + \
-                                RUSH_TD_POINTS*wr_rush_tds_avg[_i] + REC_YD_POINTS*wr_rec_yds_avg[_i] + \
-                                REC_POINTS*wr_rec_tot_avg[_i] + REC_TD_POINTS*wr_rec_tds_avg[_i] + \
-                                FUMBLE_POINTS*wr_fum_avg[_i]
-            print(" " + str(wr_name[_i]) + ":\n   -Value: " + str(avg_fantasy_value))
-
-    # TEs
-    total_TEs = int(np.linalg.norm(tes.value,1))
-    print("\nNumber of TEs: " + str(total_TEs))
-    for _i in range(len(tes.value)):
-        if tes.value[_i]:
-            avg_fantasy_value = PASS_YD_POINTS*te_pass_yds_avg[_i] + PASS_TD_POINTS*te_pass_tds_avg[_i] + \
-                                PASS_INT_POINTS*te_pass_ints_avg[_i] + RUSH_YD_POINTS*te_rush_yds_avg[_i] + \
-                                RUSH_TD_POINTS*te_rush_tds_avg[_i] + REC_YD_POINTS*te_rec_yds_avg[_i] + \
-                                REC_POINTS*te_rec_tot_avg[_i] + REC_TD_POINTS*te_rec_tds_avg[_i] + \
-                                FUMBLE_POINTS*te_fum_avg[_i]
-            print(" " + str(te_name[_i]) + ":\n   -Value: " + str(avg_fantasy_value))
\ No newline at end of file
+def _load_projections(args, quiet:bool=False):
+    """
+    Load the player store of the selected seasons and project every player's stats and fantasy value.
+    """
+    seasons = range(args.first_season_year, args.current_season_year)
+    seasons_csv = [os.path.join(args.stat_dir, str(season) + ".csv") for season in seasons]
+
+    # Get all potential players to draft (for now no rookies, only players from last year)
+    store = PlayerStore.from_csvs(seasons_csv, seasons)
+    if not quiet:
+        for season, names in store.unmatched.items():
+            if names:
+                print("Unmatched players in " + str(season) + ": " + str(len(names)))
+
+    # Get projected stats and fantasy value
+    with INSTRUMENTATION.stage("projection"):
+        draftee_avg = merge_player_stats(store, half_life=args.half_life,
+                                         age_curves=AGE_CURVES if args.age_curves else None,
+                                         regression=args.regression)
+        draftee_value = fantasy_value(draftee_avg, SCORING_PROFILES[args.profile])
+    return store, draftee_avg, draftee_value
+
+def _load_optimizer(args, store:PlayerStore, draftee_value:np.ndarray, quiet:bool=False):
+    """
+    Create the roster optimizer and remove the players already drafted.
+    """
+    caps, total_players = _roster_caps(args, store, quiet)
+    optimizer = RosterOptimizer(store.position, draftee_value, caps=caps, total_players=total_players,
+                                backend=args.backend)
+    _add_team_terms(args, store, optimizer)
+    drafted_rows, missing = store.lookup([name for name, team in DraftLog(args.drafted).poll(final=True)])
+    optimizer.mark_drafted(drafted_rows)
+    if missing and not quiet:
+        print("Drafted players not found: " + ", ".join(missing))
+    return optimizer
+
+def _add_team_terms(args, store:PlayerStore, optimizer:RosterOptimizer):
+    """
+    Add the requested stacking, anti-stacking, usage and teammate covariance terms to the optimizer.
+    """
+    if args.max_per_team is not None:
+        optimizer.add_constraint(team_limit(store.team, args.max_per_team))
+    if args.qb_stack > 0:
+        optimizer.add_constraint(quarterback_stack(store.team, store.position, args.qb_stack))
+    max_share = {
+        stat: limit for stat, limit in (("targets", args.max_target_share), ("rush_att", args.max_carry_share))
+        if limit is not None
+    }
+    if max_share:
+        optimizer.add_constraint(usage_limit(store.team, store.usage_share(), max_share))
+    if args.teammate_penalty > 0:
+        spread = np.sqrt(projection_spread(store)**2 @ scoring_weights(SCORING_PROFILES[args.profile])**2)
+        optimizer.add_penalty(teammate_penalty(store.team, spread, args.teammate_penalty,
+                                               max_players=optimizer.total_players))
+
+def _print_recommendations(store:PlayerStore, optimizer:RosterOptimizer, top:int):
+    """
+    Recommend the next picks by the optimal roster value lost if someone else takes them.
+    """
+    print("\nRecommended picks:")
+    with INSTRUMENTATION.stage("recommend"):
+        recommended = optimizer.recommend(top)
+    for _i, drop in zip(*recommended):
+        print(" " + str(store.name[_i]) + ":\n   -Value over replacement: " + str(drop))
+
+def command_solve(args):
+    """
+    Solve and print the optimal roster (plus optional simulations).
+    """
+    store, draftee_avg, draftee_value = _load_projections(args)
+    optimizer = _load_optimizer(args, store, draftee_value)
+    roster = optimizer.solve()
+
+    # Print players with associated avg fantasy value
+    for pos, rows in optimizer.rows.items():
+        rows = rows[roster[rows]]
+        print("\nNumber of " + pos + "s: " + str(len(rows)))
+        for _i in rows:
+            print(" " + str(store.name[_i]) + ":\n   -Value: " + str(draftee_value[_i]))
+
+    _print_recommendations(store, optimizer, args.top)
+
+    # Simulate projection scenarios and print how often players make the optimal roster
+    if args.simulations > 0:
+        result = simulate_rosters(store, args.simulations, SCORING_PROFILES[args.profile],
+                                  available=optimizer.availability, caps=optimizer.caps,
+                                  total_players=optimizer.total_players, workers=args.workers,
+                                  projection=draftee_avg)
+        print("\nSimulated roster value: " + str(np.mean(result.roster_value)) + " +/- " + \
+              str(np.std(result.roster_value)))
+        for _i in np.argsort(-result.pick_frequency)[:optimizer.total_players*2]:
+            print(" " + str(store.name[_i]) + ":\n   -Pick frequency: " + str(result.pick_frequency[_i]) + \
+                  "\n   -Value: " + str(result.player_value_mean[_i]) + " +/- " + str(result.player_value_std[_i]))
+
+    # Simulate snake drafts and print our expected roster value from each draft slot
+    if args.draft_teams > 0:
+        result = simulate_drafts(draftee_value, store.position, teams=args.draft_teams, drafts=args.drafts,
+                                 caps=optimizer.caps, total_players=optimizer.total_players, workers=args.workers)
+        print("\nExpected roster value by draft slot:")
+        for slot in range(args.draft_teams):
+            print(" Slot " + str(slot+1) + ": " + str(result.slot_value_mean[slot]) + " +/- " + \
+                  str(result.slot_value_std[slot]))
+
+def command_recommend(args):
+    """
+    Print the next-pick recommendations only.
+    """
+    store, _, draftee_value = _load_projections(args, quiet=True)
+    _print_recommendations(store, _load_optimizer(args, store, draftee_value, quiet=True), args.top)
+
+def command_backtest(args):
+    """
+    Backtest the optimizer over every season with earlier data and write the results csv.
+    """
+    # Every caps set overrides the --caps caps and is named by its overrides
+    caps_grid = {" ".join(overrides) or "default": _parse_caps((args.caps or []) + overrides)
+                 for overrides in args.caps_grid or [[]]}
+    results = backtest(args.stat_dir, profiles=[SCORING_PROFILES[profile] for profile in args.profiles],
+                       windows=args.windows, caps_grid=caps_grid,
+                       total_players=args.total_players, workers=args.workers,
+                       projection=dict(half_life=args.half_life, age_curves=AGE_CURVES if args.age_curves else None,
+                                       regression=args.regression))
+    results.to_csv(args.output, index=False)
+    print("Backtest of " + str(len(results)) + " cells written to " + args.output)
+
+def command_ingest(args):
+    """
+    Add weekly stat csvs to the running per-player aggregates.
+    """
+    running = RunningStats.load(args.state) if os.path.exists(args.state) else RunningStats()
+    for csv in args.weeks:
+        with INSTRUMENTATION.stage("ingest_week", csv=csv):
+            running.ingest_week(csv)
+    running.save(args.state)
+    print("Running stats of " + str(len(running)) + " players saved to " + args.state)
+
+def command_serve(args):
+    """
+    Keep the draft room loaded and serve picks and recommendations locally.
+    """
+    import asyncio
+
+    store, _, draftee_value = _load_projections(args)
+    caps, total_players = _roster_caps(args, store, quiet=True)
+    room = DraftRoom(store, draftee_value, our_team=args.our_team, recommendations=args.top,
+                     caps=caps, total_players=total_players, backend=args.backend)
+    _add_team_terms(args, store, room.optimizer)
+
+    # Players drafted before the server started leave the pool; picks appended later are recorded as they come
+    log = DraftLog(args.drafted)
+    drafted_rows, missing = store.lookup([name for name, team in log.poll(final=True)])
+    room.optimizer.mark_drafted(drafted_rows)
+    if missing:
+        print("Drafted players not found: " + ", ".join(missing))
+    print("Serving draft room on http://" + args.host + ":" + str(args.port) + ", following " + args.drafted)
+    asyncio.run(DraftServer(room).serve(host=args.host, port=args.port, log=log))
+
+# Subcommands (solve runs when none is given)
+COMMANDS = {
+    "solve": command_solve,
+    "recommend": command_recommend,
+    "backtest": command_backtest,
+    "ingest": command_ingest,
+    "serve": command_serve,
+}
+
+def cli(argv:list=None):
+    """
+    Command line entry point. Heavy dependencies (pandas, cvxpy, asyncio, process pools) are only imported
+    by the subcommands that use them, and seasons load from their binary cache when it is up to date.
+    """
+    # Options shared by every subcommand
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--stat-dir", default="Player_Statistics/", help="directory of the season csvs")
+    common.add_argument("--first-season-year", type=int, default=2020, help="first season projected from")
+    common.add_argument("--current-season-year", type=int, default=2024, help="season being drafted")
+    common.add_argument("--drafted", default="players_drafted.csv", help="csv of players already drafted")
+    common.add_argument("--profile", default="league", choices=SCORING_PROFILES, help="scoring profile")
+    common.add_argument("--caps", nargs="+", metavar="POS=MIN:MAX", help="override roster caps, e.g. RB=3:6")
+    common.add_argument("--total-players", type=int, default=TOTAL_PLAYERS, help="total players on the roster")
+    common.add_argument("--backend", default="auto", choices=("auto", "exact", "cvxpy"), help="roster solver")
+    common.add_argument("--max-per-team", type=int, help="most roster players from one team")
+    common.add_argument("--qb-stack", type=int, default=0, help="same-team WR/TE required per quarterback")
+    common.add_argument("--max-target-share", type=float, help="most combined target share from one team")
+    common.add_argument("--max-carry-share", type=float, help="most combined carry share from one team")
+    common.add_argument("--teammate-penalty", type=float, default=0.,
+                        help="roster value given up per unit of value covariance across teammates")
+    common.add_argument("--half-life", type=float, help="seasons over which a season's projection weight halves")
+    common.add_argument("--age-curves", action="store_true", help="adjust projections with AGE_CURVES")
+    common.add_argument("--regression", type=float, default=0., help="seasons of regression to the positional mean")
+    common.add_argument("--top", type=int, default=10, help="next picks to recommend (the cvxpy backend re-solves about this many "
+                        "times, once per roster player with --teammate-penalty)")
+    common.add_argument("--workers", type=int, help="worker processes for simulations and backtests")
+    common.add_argument("--trace", help='write stage timings as JSON lines to this file ("-" for stderr)')
+    common.add_argument("--profile-stages", action="store_true", help="include a cProfile of each traced stage")
+    common.add_argument("--trace-memory", action="store_true", help="include the peak memory of each traced stage")
+
+    parser = argparse.ArgumentParser(description="Fantasy football drafting optimizer.")
+    commands = parser.add_subparsers(dest="command")
+    solve = commands.add_parser("solve", parents=[common], help="solve and print the optimal roster")
+    solve.add_argument("--simulations", type=int, default=0, help="Monte Carlo projection scenarios to simulate")
+    solve.add_argument("--draft-teams", type=int, default=0, help="teams in the league for snake draft simulations")
+    solve.add_argument("--drafts", type=int, default=1000, help="snake drafts simulated from each draft slot")
+    commands.add_parser("recommend", parents=[common], help="print the next-pick recommendations")
+    backtest_parser = commands.add_parser("backtest", parents=[common], help="backtest over historical seasons")
+    backtest_parser.add_argument("--output", default="backtest.csv", help="csv to write the results to")
+    backtest_parser.add_argument("--profiles", nargs="+", default=list(SCORING_PROFILES), choices=SCORING_PROFILES,
+                                 help="scoring profiles to sweep")
+    backtest_parser.add_argument("--windows", type=int, nargs="+", default=[1, 2, 3, 4],
+                                 help="projection windows (earlier seasons) to sweep")
+    backtest_parser.add_argument("--caps-grid", nargs="*", action="append", metavar="POS=MIN:MAX",
+                                 help="caps set to sweep on top of --caps (repeat for each set, empty for --caps "
+                                      "alone)")
+    ingest = commands.add_parser("ingest", parents=[common], help="add weekly stat csvs to the running stats")
+    ingest.add_argument("weeks", nargs="+", help="weekly stat csvs, oldest first")
+    ingest.add_argument("--state", default=os.path.join("Player_Statistics", "weekly_stats.npz"),
+                        help="file holding the running stats")
+    serve = commands.add_parser("serve", parents=[common], help="serve the draft room over local HTTP")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    serve.add_argument("--port", type=int, default=8765, help="port to listen on")
+    serve.add_argument("--our-team", help="team name of our picks")
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ("-h", "--help")):
+        argv = ["solve"] + argv
+    args = parser.parse_args(argv)
+
+    # Stage timing instrumentation
+    if args.trace is not None:
+        INSTRUMENTATION.configure(sys.stderr if args.trace == "-" else open(args.trace, "a"),
+                                  profile=args.profile_stages, memory=args.trace_memory)
+    with INSTRUMENTATION.stage("command", command=args.command):
+        COMMANDS[args.command](args)
+
+if __name__ == "__main__":
+    cli()
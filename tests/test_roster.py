@@ -0,0 +1,283 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import (POSITION_CODES, POSITIONS, STATS, PlayerStore, RosterOptimizer, RunningStats, SeasonStats,
+                  _optimizer_pick, merge_seasons, roster_value_drop, simulate_drafts, solve_cardinality_roster,
+                  team_limit)
+
+# Small roster so random pools are sometimes too thin to fill it
+CAPS = {"QB": (1, 2), "RB": (2, 3), "WR": (2, 3), "TE": (1, 2), "K": (0, 1)}
+TOTAL_PLAYERS = 7
+
+def random_pool(seed:int):
+    """
+    Seeded random pool of values, position codes and availability.
+    """
+    rng = np.random.default_rng(seed)
+    players = int(rng.integers(6, 40))
+    position = rng.choice([POSITION_CODES[pos] for pos in CAPS], players).astype(np.int8)
+    value = np.round(rng.gamma(2., 50., players), 1)
+    available = rng.random(players) < 0.8
+    return value, position, available
+
+def exact_objective(value, position, available):
+    """
+    Optimal roster value of the exact solver, or None when the pool cannot fill the roster.
+    """
+    try:
+        return solve_cardinality_roster(value, position, available, CAPS, TOTAL_PLAYERS)[1]
+    except ValueError:
+        return None
+
+@pytest.mark.parametrize("seed", range(30))
+def test_exact_solver_matches_cvxpy(seed):
+    pytest.importorskip("cvxpy")
+    value, position, available = random_pool(seed)
+    optimizer = RosterOptimizer(position, value, caps=CAPS, total_players=TOTAL_PLAYERS, backend="cvxpy")
+    optimizer.update(available=available)
+
+    objective = exact_objective(value, position, available)
+    if objective is None:
+        with pytest.raises(ValueError):
+            optimizer.solve()
+        return
+    roster = optimizer.solve()
+    assert optimizer.objective == pytest.approx(objective)
+    assert value[roster].sum() == pytest.approx(objective)
+    assert not (roster & ~available).any()
+    for pos, (min_count, max_count) in CAPS.items():
+        assert min_count <= np.count_nonzero(roster & (position == POSITION_CODES[pos])) <= max_count
+    assert roster.sum() == TOTAL_PLAYERS
+
+@pytest.mark.parametrize("seed", range(30))
+def test_exact_backend_keeps_players(seed):
+    pytest.importorskip("cvxpy")
+    value, position, available = random_pool(seed)
+    kept = np.flatnonzero(available)[:2]
+    solutions = []
+    for backend in ("exact", "cvxpy"):
+        optimizer = RosterOptimizer(position, value, caps=CAPS, total_players=TOTAL_PLAYERS, backend=backend)
+        optimizer.update(available=available)
+        optimizer.mark_kept(kept)
+        try:
+            roster = optimizer.solve()
+        except ValueError:
+            solutions.append(None)
+            continue
+        assert roster[kept].all()
+        solutions.append(optimizer.objective)
+    assert (solutions[0] is None) == (solutions[1] is None)
+    if solutions[0] is not None:
+        assert solutions[0] == pytest.approx(solutions[1])
+
+def test_relaxed_problem_falls_back_per_solve_on_ties():
+    cp = pytest.importorskip("cvxpy")
+    caps = {"QB": (1, 1), "K": (1, 1)}
+    position = np.array([POSITION_CODES[pos] for pos in ["QB", "QB", "K", "K", "K"]], dtype=np.int8)
+    value = np.array([300., 250., 100., 100., 100.])
+    optimizer = RosterOptimizer(position, value, caps=caps, total_players=2, backend="cvxpy")
+
+    # An interior point solver stops between the tied kickers, so that solve alone falls back to the MILP
+    roster = optimizer.solve(solver=cp.CLARABEL)
+    assert roster.sum() == 2 and roster[0] and optimizer.objective == pytest.approx(400.)
+    assert optimizer.relaxed
+    optimizer.update(value=value + np.arange(5))
+    roster = optimizer.solve()
+    np.testing.assert_array_equal(roster, [True, False, False, False, True])
+    assert optimizer.problem.solver_stats.solver_name == cp.HIGHS
+
+@pytest.mark.parametrize("seed", range(10))
+def test_cvxpy_recommend_matches_brute_force_with_team_limit(seed):
+    pytest.importorskip("cvxpy")
+    value, position, available = random_pool(seed + 100)
+    team = np.random.default_rng(seed).choice(["NYJ", "BUF", "MIA"], len(value))
+    optimizer = RosterOptimizer(position, value, caps=CAPS, total_players=TOTAL_PLAYERS, backend="cvxpy")
+    optimizer.add_constraint(team_limit(team, 3))
+    optimizer.update(available=available)
+    try:
+        roster = optimizer.solve()
+    except ValueError:
+        return
+    optimum = optimizer.objective
+
+    # Every roster player's drop from its own re-solve
+    drop = np.zeros(len(value))
+    for _i in np.flatnonzero(roster):
+        optimizer.mark_drafted(_i)
+        try:
+            optimizer.solve()
+            drop[_i] = optimum - optimizer.objective
+        except ValueError:
+            drop[_i] = np.inf
+        optimizer.mark_available(_i)
+    rows = np.flatnonzero(available)
+    expected = rows[np.lexsort((-value[rows], -drop[rows]))][:3]
+
+    recommended, recommended_drop = optimizer.recommend(3)
+    np.testing.assert_allclose(recommended_drop, drop[expected])
+    np.testing.assert_array_equal(recommended, expected)
+
+@pytest.mark.parametrize("seed", range(30))
+def test_roster_value_drop_matches_brute_force(seed):
+    value, position, available = random_pool(seed)
+    optimum = exact_objective(value, position, available)
+    if optimum is None:
+        return
+    drop = roster_value_drop(value, position, available, CAPS, TOTAL_PLAYERS)
+    for _i in np.flatnonzero(available):
+        without = available.copy()
+        without[_i] = False
+        objective = exact_objective(value, position, without)
+        expected = np.inf if objective is None else optimum - objective
+        assert drop[_i] == pytest.approx(expected)
+
+def test_running_stats_match_recomputed_moments():
+    rng = np.random.default_rng(0)
+    names = ["Player " + str(_i) for _i in range(25)]
+    running = RunningStats(capacity=4)
+    games = {name: [] for name in names}
+    for week in range(12):
+        # Some players miss weeks and some are listed twice in a week
+        listed = rng.choice(names, 30, replace=True)
+        records = [(name, POSITION_CODES["WR"], rng.normal(50., 20., len(STATS))) for name in listed]
+        for name, position, stats in records:
+            games[name].append(stats)
+        running.update(records)
+
+    for name, stats in games.items():
+        row = running.index.get(name.lower())
+        if not stats:
+            assert row is None
+            continue
+        stats = np.array(stats)
+        assert running.games[row] == len(stats)
+        np.testing.assert_allclose(running.total[row], stats.sum(axis=0))
+        np.testing.assert_allclose(running.mean[row], stats.mean(axis=0))
+        if len(stats) > 1:
+            np.testing.assert_allclose(running.variance()[row], stats.var(axis=0, ddof=1))
+        else:
+            assert np.isnan(running.variance()[row]).all()
+
+def season(names:list, positions:list, points:list, teams:list=None):
+    """
+    Season of the given players with their points as passing yards (a None position is blank).
+    """
+    stats = np.zeros((len(names), len(STATS)))
+    stats[:, 0] = points
+    teams = ["NYJ"] * len(names) if teams is None else teams
+    return SeasonStats(name=np.array(names), team=np.array(teams),
+                       position=np.array([POSITION_CODES.get(pos, -1) for pos in positions], dtype=np.int8),
+                       age=np.full(len(names), 25.), stats=stats)
+
+def test_merge_seasons_keeps_namesakes_apart():
+    earlier = season(["Ryan Griffin", "Ryan Griffin*", "Other Guy"], ["QB", "TE", "WR"], [1., 2., 3.])
+    latest = season(["Ryan Griffin", "Ryan Griffin", "Other Guy"], ["QB", "TE", "WR"], [10., 20., 30.])
+    index, stats, share, played, unmatched = merge_seasons([earlier, latest])
+
+    np.testing.assert_array_equal(stats[:, :, 0], [[1., 2., 3.], [10., 20., 30.]])
+    assert played.all()
+    assert unmatched == [[], []]
+    assert index["ryan griffin"] == [0, 1]
+
+def test_merge_seasons_keeps_history_across_position_changes():
+    earlier = season(["Taysom Hill", "Cordarrelle Patterson", "Blank Guy"], ["QB", "WR", None], [1., 2., 3.])
+    latest = season(["Taysom Hill", "Cordarrelle Patterson", "Blank Guy"], ["TE", "RB", "RB"], [10., 20., 30.])
+    index, stats, share, played, unmatched = merge_seasons([earlier, latest])
+
+    np.testing.assert_array_equal(stats[:, :, 0], [[1., 2., 3.], [10., 20., 30.]])
+    assert played.all()
+    assert unmatched == [[], []]
+
+def test_find_tells_namesakes_apart():
+    latest = season(["Ryan Griffin", "Ryan Griffin", "Mike Williams", "Mike Williams"], ["QB", "TE", "WR", "WR"],
+                    [10., 20., 30., 40.], teams=["TB", "HOU", "LAC", "TB"])
+    index, stats, share, played, unmatched = merge_seasons([latest])
+    store = PlayerStore(seasons=np.array([2023]), name=latest.name, index=index, team=latest.team,
+                        position=latest.position, age=latest.age, stats=stats, share=share, played=played)
+
+    assert store.find("Ryan Griffin", position="TE") == 1
+    assert store.find("Mike Williams", team="TB") == 3
+    assert store.find("Mike Williams", position="WR", team="LAC") == 2
+    assert store.find("Mike Williams", team="NYJ") is None
+    rows, missing = store.lookup(["Ryan Griffin", "Mike Williams"], positions=["TE", None], teams=[None, "TB"])
+    np.testing.assert_array_equal(rows, [1, 3])
+
+def test_merge_seasons_breaks_earlier_namesake_ties_by_position():
+    earlier = season(["Ryan Griffin", "Ryan Griffin", "Other Guy"], ["QB", "TE", "WR"], [1., 2., 3.])
+    latest = season(["Ryan Griffin", "Other Guy"], ["TE", "WR"], [10., 30.])
+    index, stats, share, played, unmatched = merge_seasons([earlier, latest])
+
+    np.testing.assert_array_equal(stats[:, :, 0], [[2., 3.], [10., 30.]])
+    assert unmatched[0] == ["Ryan Griffin"]
+
+def test_merge_seasons_reports_ambiguous_keys():
+    earlier = season(["Ryan Griffin", "Ryan Griffin", "Other Guy"], ["TE", "TE", "WR"], [1., 2., 3.])
+    latest = season(["Ryan Griffin", "Other Guy"], ["TE", "WR"], [10., 30.])
+    index, stats, share, played, unmatched = merge_seasons([earlier, latest])
+
+    np.testing.assert_array_equal(stats[:, :, 0], [[0., 3.], [10., 30.]])
+    np.testing.assert_array_equal(played, [[False, True], [True, True]])
+    assert unmatched[0] == ["Ryan Griffin", "Ryan Griffin"]
+
+def test_weekly_ingest_skips_headers_and_keeps_state_path(tmp_path):
+    header = ",".join(["Rk", "Player", "Tm", "FantPos", "Age"] + ["x"] * 21)
+    rows = ["1,Some Player,NYJ,WR,25" + ",1" * 21, header, "2,Other Player,NYJ,RB,24" + ",2" * 21,
+            ",League Total,,,," + ",9" * 21]
+    week = tmp_path / "week.csv"
+    week.write_text("groups\n" + header + "\n" + "\n".join(rows) + "\n")
+
+    state = str(tmp_path / "state")
+    running = RunningStats()
+    running.ingest_week(str(week))
+    running.save(state)
+    assert os.path.exists(state)
+    running = RunningStats.load(state)
+    running.ingest_week(str(week))
+    assert running.name == ["Some Player", "Other Player"]
+    np.testing.assert_array_equal(running.games[:len(running)], [2, 2])
+
+def test_optimizer_pick_with_tied_kickers():
+    caps = {"QB": (1, 1), "RB": (1, 1), "K": (1, 1)}
+    position = np.array([POSITION_CODES[pos] for pos in ["QB", "QB", "RB", "K", "K"]], dtype=np.int8)
+    value = np.array([300., 250., 200., 120., 120.])
+    available = np.array([False, True, True, True, True])
+
+    # QB already drafted: the tied kickers must not let the pick fall through to the second QB
+    row = _optimizer_pick(value, position, available, np.array([1, 1, 0]), caps, 3)
+    assert POSITIONS[position[row]] == "K"
+
+def test_simulate_drafts_with_tied_kickers_and_defenses():
+    caps = {"QB": (1, 1), "RB": (1, 2), "K": (1, 1), "DEF": (1, 1)}
+    positions = ["QB"] * 6 + ["RB"] * 10 + ["K"] * 6 + ["DEF"] * 6
+    position = np.array([POSITION_CODES[pos] for pos in positions], dtype=np.int8)
+    value = np.where(np.isin(position, [POSITION_CODES["K"], POSITION_CODES["DEF"]]), 100.,
+                     np.linspace(400., 100., len(positions)))
+    result = simulate_drafts(value, position, teams=4, drafts=2, policy="optimizer", caps=caps, total_players=4,
+                             workers=1, seed=0)
+    assert np.isfinite(result.slot_value_mean).all()
+
+def test_merged_store_cache_matches_fresh_merge(tmp_path):
+    header = ",".join(["Rk", "Player", "Tm", "FantPos", "Age"] + ["x"] * 21)
+    players = [("Ryan Griffin", "TB", "QB"), ("Ryan Griffin", "HOU", "TE"), ("Other Guy", "NYJ", "WR")]
+    csvs = []
+    for year in (2022, 2023):
+        rows = [str(_i + 1) + "," + name + "," + team + "," + pos + ",25" + ("," + str(year - 2020 + _i)) * 21
+                for _i, (name, team, pos) in enumerate(players[year - 2022:])]
+        csv = tmp_path / (str(year) + ".csv")
+        csv.write_text("groups\n" + header + "\n" + "\n".join(rows) + "\n")
+        csvs.append(str(csv))
+
+    fresh = PlayerStore.from_csvs(csvs, [2022, 2023], cache=False)
+    for _ in range(2):
+        cached = PlayerStore.from_csvs(csvs, [2022, 2023])
+        assert cached.index == fresh.index == {"ryan griffin": [0], "other guy": [1]}
+        assert cached.unmatched == {2022: ["Ryan Griffin"], 2023: []}
+        assert cached.unmatched == fresh.unmatched
+        np.testing.assert_array_equal(cached.name, fresh.name)
+        np.testing.assert_array_equal(cached.stats, fresh.stats)
+        np.testing.assert_array_equal(cached.played, fresh.played)